@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Inventory memory benchmark. Run from the root directory:
+
+    python benchmarks/bench_memory.py --count 100000
+
+Builds the same synthetic inventory as plain dicts (the former record shape) and as the slotted records
+in utils/records.py, and reports the memory traced by tracemalloc for each.
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.records import BucketFeature, EKSCluster, Instance, NodeGroup, S3Bucket, Volume
+
+
+def ec2_dicts(count):
+    return [
+        {
+            "instance_id": f"i-{n:017x}",
+            "private_ip": f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}",
+            "vpc_id": "vpc-0123456789abcdef0",
+            "instance_name": f"instance-{n}",
+            "Volumes": [
+                {"VolumeId": f"vol-{n:017x}", "VolumeType": "gp3", "Device": "/dev/xvda", "AttachmentType": "root"},
+                {"VolumeId": f"vol-{n + 1:017x}", "VolumeType": "gp3", "Device": "/dev/xvdb", "AttachmentType": "data"},
+            ],
+        }
+        for n in range(count)
+    ]
+
+
+def ec2_records(count):
+    return [
+        Instance(
+            instance_id=f"i-{n:017x}",
+            private_ip=f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}",
+            vpc_id="vpc-0123456789abcdef0",
+            instance_name=f"instance-{n}",
+            volumes=[Volume(f"vol-{n:017x}", "gp3", "/dev/xvda", "root"), Volume(f"vol-{n + 1:017x}", "gp3", "/dev/xvdb", "data")],
+        )
+        for n in range(count)
+    ]
+
+
+def s3_dicts(count):
+    return [
+        {
+            "bucket_name": f"bucket-{n}",
+            "bucket_policy": True,
+            "bucket_acl": True,
+            "bucket_versioning": n % 2 == 0,
+            "bucket_lifecycle_rule": False,
+            "bucket_intelligent_tiering": False,
+            "bucket_cors_config": False,
+            "bucket_replication_config": False,
+            "bucket_server_side_encryption": True,
+        }
+        for n in range(count)
+    ]
+
+
+def s3_records(count):
+    features = BucketFeature.POLICY | BucketFeature.ACL | BucketFeature.SERVER_SIDE_ENCRYPTION
+    return [S3Bucket(bucket_name=f"bucket-{n}", features=features | (BucketFeature.VERSIONING if n % 2 == 0 else 0)) for n in range(count)]
+
+
+def eks_dicts(count):
+    return [
+        {
+            "cluster_name": f"cluster-{n}",
+            "eks_add_ons": ["vpc-cni", "coredns"],
+            "node_groups": [{"name": f"ng-{n}-{g}", "launch_template": f"lt-{n:017x}", "asg_names": [f"eks-ng-{n}-{g}"]} for g in range(3)],
+            "vpc_id": "vpc-0123456789abcdef0",
+            "security_groups": ["sg-0123456789abcdef0"],
+            "iam_role": "eks-cluster-role",
+            "manage_external_asgs": [],
+        }
+        for n in range(count)
+    ]
+
+
+def eks_records(count):
+    return [
+        EKSCluster(
+            cluster_name=f"cluster-{n}",
+            eks_add_ons=["vpc-cni", "coredns"],
+            node_groups=[NodeGroup(name=f"ng-{n}-{g}", launch_template=f"lt-{n:017x}", asg_names=[f"eks-ng-{n}-{g}"]) for g in range(3)],
+            vpc_id="vpc-0123456789abcdef0",
+            security_groups=["sg-0123456789abcdef0"],
+            iam_role="eks-cluster-role",
+            manage_external_asgs=[],
+        )
+        for n in range(count)
+    ]
+
+
+def traced(build, count):
+    tracemalloc.start()
+    inventory = build(count)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del inventory
+    return size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inventory memory benchmark")
+    parser.add_argument("--count", dest="count", help="Records per resource type", type=int, default=100000)
+    args = parser.parse_args()
+
+    for name, as_dicts, as_records in (("ec2", ec2_dicts, ec2_records), ("s3", s3_dicts, s3_records), ("eks", eks_dicts, eks_records)):
+        dict_size = traced(as_dicts, args.count)
+        record_size = traced(as_records, args.count)
+        print(f"{name:4} {args.count} records  dicts: {dict_size / 2**20:8.1f} MiB  records: {record_size / 2**20:8.1f} MiB  reduction: {100 * (1 - record_size / dict_size):5.1f}%")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+CLI startup time benchmark. Run from the root directory:
+
+    python benchmarks/bench_startup.py
+
+Measures `main.py --help` against a bare interpreter start and fails when the overhead on top of the
+interpreter exceeds STARTUP_BUDGET_SECONDS. Importing an importer module (boto3, jinja2) is reported for comparison.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+# Budget for main.py --help on top of a bare interpreter start
+STARTUP_BUDGET_SECONDS = 0.15
+
+
+def measure(cmd, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CLI startup time benchmark")
+    parser.add_argument("--runs", dest="runs", help="Runs per measurement, median is reported", type=int, default=10)
+    args = parser.parse_args()
+
+    interpreter = measure([sys.executable, "-c", "pass"], args.runs)
+    help_time = measure([sys.executable, "main.py", "--help"], args.runs)
+    importer_time = measure([sys.executable, "-c", "from utils.registry import get_importer; get_importer('ec2')"], args.runs)
+
+    overhead = help_time - interpreter
+    print(f"interpreter start            : {interpreter * 1000:8.1f} ms")
+    print(f"main.py --help               : {help_time * 1000:8.1f} ms (+{overhead * 1000:.1f} ms)")
+    print(f"registry + ec2 importer load : {importer_time * 1000:8.1f} ms (+{(importer_time - interpreter) * 1000:.1f} ms)")
+    print(f"budget                       : {STARTUP_BUDGET_SECONDS * 1000:8.1f} ms")
+
+    if overhead > STARTUP_BUDGET_SECONDS:
+        print("FAIL: main.py --help is over the startup budget")
+        sys.exit(1)
+    print("OK")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import queue
+import socketserver
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.import_runner import ImportRunner
+from utils.change_feed import ChangeFeed
+from utils.registry import IMPORTERS, IMPORTER_ARGS, get_importer
+
+
+from loguru import logger
+
+
+class ImportDaemon:
+    """
+    Run Import jobs one after another in a single long running process.
+    Boto3 clients, compiled templates and initialized workspaces are reused between jobs.
+    """
+
+    def __init__(self):
+        self.jobs = {}
+        self.job_queue = queue.Queue()
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+
+    def submit(self, request):
+        """
+        Validate an Import job request and queue it. Returns the job.
+        """
+        if not isinstance(request, dict):
+            raise ValueError("The request body must be a JSON object")
+        resource = request.get("resource")
+        if resource not in IMPORTERS:
+            raise ValueError(f"Import Not currently supported for {resource}")
+        for key in ("region", "local_repo_path"):
+            if not request.get(key):
+                raise ValueError(f"{key} is required")
+        for key in IMPORTER_ARGS.get(resource, ()):
+            if not request.get(key):
+                raise ValueError(f"{key} is required when resource is '{resource}'")
+        if not isinstance(request.get("tags") or {}, dict):
+            raise ValueError("tags must be an object of tag keys to values")
+        if request.get("import_format", "hcl") not in ("hcl", "json"):
+            raise ValueError("import_format must be hcl or json")
+        if request.get("output_layout", "per-resource") not in ("per-resource", "sharded"):
+            raise ValueError("output_layout must be per-resource or sharded")
+        for key in ("plan_workers", "plan_chunk_size", "shard_size_kb"):
+            value = request.get(key)
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 1):
+                raise ValueError(f"{key} must be a positive integer")
+
+        job = {"job_id": uuid.uuid4().hex, "status": "queued", "request": request, "files": [], "error": None}
+        self.jobs[job["job_id"]] = job
+        self.job_queue.put(job)
+        return job
+
+    def run_job(self, job):
+        request = job["request"]
+        runner = None
+        try:
+            tags = request.get("tags") or {}
+            runner = ImportRunner.from_options(request)
+
+            kwargs = {"region": request["region"], "resource": request["resource"], "local_repo_path": request["local_repo_path"], "filters": list(tags.items()), "profile": runner.aws_profile, "runner": runner}
+            kwargs.update({key: request[key] for key in IMPORTER_ARGS.get(request["resource"], ())})
+
+            change_feed = None
+            if request.get("change_feed"):
+                change_feed = ChangeFeed(request["change_feed"], request["local_repo_path"], resource=request["resource"], region=request["region"])
+                kwargs["resource_ids"] = change_feed.changed_ids()
+            if change_feed is None or kwargs["resource_ids"]:
+                get_importer(request["resource"])(**kwargs).set_everything()
+            if change_feed is not None and not runner.render_only:
+                # A render only job imports nothing, the changes are left to the next real import
+                change_feed.save_watermark()
+            job["status"] = "succeeded"
+        except SystemExit as e:
+            # Importers exit when there is nothing to import
+            job["status"] = "failed"
+            job["error"] = f"Import exited with code {e.code}"
+        except Exception as e:
+            logger.exception(f"Import job {job['job_id']} failed")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        if runner is not None:
+            job["files"] = runner.output_files()
+
+    def work(self):
+        while True:
+            job = self.job_queue.get()
+            job["status"] = "running"
+            logger.info(f"Running Import job {job['job_id']}: {job['request']}")
+            try:
+                self.run_job(job)
+            except Exception as e:
+                # Nothing may stop the only worker, later jobs would stay queued forever
+                logger.exception(f"Import job {job['job_id']} failed")
+                job["status"] = "failed"
+                job["error"] = job["error"] or str(e)
+            logger.info(f"Import job {job['job_id']} {job['status']}")
+
+
+class ImportRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /jobs with a JSON body to queue a job, GET /jobs/<job_id> for its status and generated files.
+    """
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self.send_json(404, {"error": "Not Found"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            job = self.server.import_daemon.submit(request)
+        except ValueError as e:
+            return self.send_json(400, {"error": str(e)})
+        self.send_json(202, {"job_id": job["job_id"], "status": job["status"]})
+
+    def do_GET(self):
+        job_id = self.path.rstrip("/").split("/jobs/")[-1]
+        job = self.server.import_daemon.jobs.get(job_id)
+        if not self.path.startswith("/jobs/") or job is None:
+            return self.send_json(404, {"error": "Not Found"})
+        self.send_json(200, {key: job[key] for key in ("job_id", "status", "error", "files")})
+
+    def log_message(self, format, *args):
+        logger.info(format % args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TF Import Daemon")
+    parser.add_argument("--socket", dest="socket", help="Listen on this Unix socket path instead of HTTP", type=str)
+    parser.add_argument("--host", dest="host", help="HTTP listen address", type=str, default="127.0.0.1")
+    parser.add_argument("--port", dest="port", help="HTTP listen port", type=int, default=8750)
+    args = parser.parse_args()
+
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixHTTPServer(args.socket, ImportRequestHandler)
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        server.get_request = lambda: (server.socket.accept()[0], ("unix", 0))
+        logger.info(f"Listening on {args.socket}")
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), ImportRequestHandler)
+        logger.info(f"Listening on http://{args.host}:{args.port}")
+
+    server.import_daemon = ImportDaemon()
+    server.serve_forever()
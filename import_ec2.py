@@ -1,12 +1,17 @@
 from utils.utilities import Utilities, SkipTag
-from jinja2 import Environment, FileSystemLoader
 from loguru import logger
-import os
 from botocore.exceptions import ClientError
-from utils.cleanup import cleanup_tf_plan_file
+from utils.import_runner import ImportRunner
+from utils.records import Instance, Volume
+from utils.pagination import paginate_items
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import re
 
+# describe_volumes and describe_instances accept up to 200 values per filter
+VOLUME_FILTER_BATCH_SIZE = 200
+HOSTED_ZONE_LOOKUP_WORKERS = 8
+
 
 class EC2ImportSetUp:
     """
@@ -15,22 +20,27 @@ class EC2ImportSetUp:
     Note: Target Group Attachement resource import is not supported by Provider
     """
 
-    def __init__(self, region, resource, local_repo_path, hosted_zone_name, filters, profile):
-        self.client = Utilities.create_session(region=region, resource=resource, profile=profile)
-        self.tmpl = Environment(loader=FileSystemLoader("templates"))
+    def __init__(self, region, resource, local_repo_path, hosted_zone_name, filters, profile, runner=None, resource_ids=None):
+        self.client = Utilities.create_client(region=region, resource=resource, profile=profile)
+        self.tmpl = Utilities.get_template_env()
         self.region = region
         self.aws_profile = profile
         self.local_repo_path = local_repo_path
         self.hosted_zone_name = hosted_zone_name
         self.tag_filters = {key: value for key, value in filters} if filters else {}
+        self.runner = runner or ImportRunner(local_repo_path=local_repo_path, region=region, profile=profile)
+        # Only these resources are discovered when given, IDs from the change feed
+        self.resource_ids = set(resource_ids) if resource_ids is not None else None
+        self.route53_client = Utilities.create_client(region=region, resource="route53", profile=profile)
+        self.hosted_zone_ids = {}
+        self.record_indexes = {}
 
     def get_hosted_zone_id(self, vpc_id):
         """
         Get Hosted Zone ID from Zone Name.
         """
-        client = Utilities.create_client(region=self.region, resource="route53", profile=self.aws_profile)
         # List hosted zones associated with the given VPC
-        response = client.list_hosted_zones_by_vpc(VPCId=vpc_id, VPCRegion=self.region)
+        response = self.route53_client.list_hosted_zones_by_vpc(VPCId=vpc_id, VPCRegion=self.region)
 
         hosted_zones = response.get("HostedZoneSummaries", [])
         for zone in hosted_zones:
@@ -38,10 +48,34 @@ class EC2ImportSetUp:
                 return zone["HostedZoneId"]
         return None
 
+    def resolve_hosted_zones(self, instance_details):
+        """
+        Resolve the Hosted Zone ID of every distinct VPC once, concurrently. Cached for the run.
+        """
+        vpc_ids = {instance.vpc_id for instance in instance_details if instance.vpc_id} - self.hosted_zone_ids.keys()
+        if vpc_ids:
+            with ThreadPoolExecutor(max_workers=min(HOSTED_ZONE_LOOKUP_WORKERS, len(vpc_ids))) as executor:
+                self.hosted_zone_ids.update(zip(vpc_ids, executor.map(self.get_hosted_zone_id, vpc_ids)))
+        return self.hosted_zone_ids
+
     def sanitize_name(self, filename):
         # Replace invalid characters with an underscore
         return re.sub(r'[<>:"/\\|?*]', "_", filename)
 
+    def describe_volumes(self, instance_ids):
+        """
+        Get EBS volume attachments for the given instances in bulk, keyed by instance id
+        """
+        volumes = {instance_id: [] for instance_id in instance_ids}
+
+        for start in range(0, len(instance_ids), VOLUME_FILTER_BATCH_SIZE):
+            batch = instance_ids[start : start + VOLUME_FILTER_BATCH_SIZE]
+            for volume in paginate_items(self.client, "describe_volumes", "Volumes", Filters=[{"Name": "attachment.instance-id", "Values": batch}]):
+                for attachment in volume["Attachments"]:
+                    if attachment["InstanceId"] in volumes:
+                        volumes[attachment["InstanceId"]].append(Volume(volume_id=volume["VolumeId"], volume_type=volume["VolumeType"], device=attachment["Device"]))
+        return volumes
+
     def describe_instance(self):
         """
         Get Instance details
@@ -51,115 +85,126 @@ class EC2ImportSetUp:
         # Add a filter to exclude terminated instances
         filters.append({"Name": "instance-state-name", "Values": ["pending", "running", "shutting-down", "stopping", "stopped"]})
 
-        instances = self.client.instances.filter(Filters=filters)
+        instance_filters = [filters]
+        if self.resource_ids is not None:
+            instance_ids = sorted(self.resource_ids)
+            instance_filters = [filters + [{"Name": "instance-id", "Values": instance_ids[start : start + VOLUME_FILTER_BATCH_SIZE]}] for start in range(0, len(instance_ids), VOLUME_FILTER_BATCH_SIZE)]
+
+        instances = [
+            (reservation["OwnerId"], instance) for instance_filter in instance_filters for reservation in paginate_items(self.client, "describe_instances", "Reservations", Filters=instance_filter) for instance in reservation["Instances"]
+        ]
         instance_details = []
+        root_device_names = {}
+
+        for owner_id, instance in instances:
+            instance_id = instance["InstanceId"]
+            instance_tags = {tag["Key"]: tag["Value"] for tag in instance.get("Tags", [])}
 
-        for instance in instances:
-            instance_tags = {tag["Key"]: tag["Value"] for tag in instance.tags}
-            
             # Skip instances with the TF_IMPORTED tag set to true
             if instance_tags.get("TF_IMPORTED") == SkipTag.TF_IMPORTED.value:
-                logger.info(f"Skipping Instance {instance.id} where TF_IMPORTED tag is set")
+                logger.info(f"Skipping Instance {instance_id} where TF_IMPORTED tag is set")
                 continue
-            
+
             # Skip instances with the aws:ec2launchtemplate:id tag set
             if "aws:ec2launchtemplate:id" in instance_tags:
-                logger.info(f"Skipping Instance {instance.id} where aws:ec2launchtemplate:id tag is set")
+                logger.info(f"Skipping Instance {instance_id} where aws:ec2launchtemplate:id tag is set")
                 continue
-            
-            instance_info = {"instance_id": instance.id, "private_ip": instance.private_ip_address, "vpc_id": instance.vpc_id, "instance_name": None, "Volumes": []}
-
-            for tag in instance.tags:
-                if tag["Key"] == "Name":
-                    instance_info["instance_name"] = self.sanitize_name(tag["Value"])
-                    break
 
-            for volume in instance.volumes.all():
-                volume_type = volume.volume_type
-                root_device_name = instance.root_device_name
-                attachment = volume.attachments[0]
+            instance_info = Instance(
+                instance_id=instance_id,
+                private_ip=instance.get("PrivateIpAddress"),
+                vpc_id=instance.get("VpcId"),
+                instance_name=self.sanitize_name(instance_tags["Name"]) if "Name" in instance_tags else None,
+                arn=f"arn:{self.client.meta.partition}:ec2:{self.region}:{owner_id}:instance/{instance_id}",
+            )
+            root_device_names[instance_id] = instance.get("RootDeviceName")
+            instance_details.append(instance_info)
 
-                attachment_info = {"VolumeId": volume.id, "VolumeType": volume_type, "Device": attachment["Device"], "AttachmentType": "root" if attachment["Device"] == root_device_name else "data"}
-                instance_info["Volumes"].append(attachment_info)
+        # Join the volumes fetched in bulk to their instances
+        volumes = self.describe_volumes([instance.instance_id for instance in instance_details])
+        for instance_info in instance_details:
+            for volume in volumes[instance_info.instance_id]:
+                volume.attachment_type = "root" if volume.device == root_device_names[instance_info.instance_id] else "data"
+                instance_info.volumes.append(volume)
 
-            instance_details.append(instance_info)
         logger.info(f"Total EC2 Instances Found: { len(instance_details) }")
         return instance_details
 
-    def check_dns_record(self, ip, hosted_zone_id):
+    def get_record_index(self, hosted_zone_id):
         """
-        Get Instance DNS Record
+        Map of IP to DNS Record name for a Hosted Zone, built once per zone.
         """
-        client = Utilities.create_client(region=self.region, resource="route53", profile=self.aws_profile)
-        # Retrieve the list of record sets for the specified hosted zone
-        paginator = client.get_paginator("list_resource_record_sets")
-        record_sets = paginator.paginate(HostedZoneId=hosted_zone_id)
+        if hosted_zone_id in self.record_indexes:
+            return self.record_indexes[hosted_zone_id]
 
-        record_found = False
-        record_name = None
+        # Retrieve the list of record sets for the specified hosted zone
+        record_index = {}
         try:
-            for page in record_sets:
-                for record_set in page["ResourceRecordSets"]:
-                    for record in record_set.get("ResourceRecords", []):
-                        if record["Value"] == ip:
-                            record_name = record_set["Name"]
-                            record_found = True
-                            break
-                if record_found:
-                    break
+            for record_set in paginate_items(self.route53_client, "list_resource_record_sets", "ResourceRecordSets", HostedZoneId=hosted_zone_id):
+                for record in record_set.get("ResourceRecords", []):
+                    record_index.setdefault(record["Value"], record_set["Name"])
         except ClientError as e:
             if e.response["Error"]["Code"] == "NoSuchHostedZone":
                 logger.error(f"No hosted zone found with ID: {hosted_zone_id}")
-            return False, None
 
-        return record_found, record_name
+        self.record_indexes[hosted_zone_id] = record_index
+        return record_index
+
+    def check_dns_record(self, ip, hosted_zone_id):
+        """
+        Get Instance DNS Record
+        """
+        record_name = self.get_record_index(hosted_zone_id).get(ip)
+        return record_name is not None, record_name
 
     def generate_import_blocks(self, instance_details):
         """
         Generate Import Blocks, Generate Terraform code, Cleanup Terraform code
         """
         if not instance_details:
+            if self.resource_ids is not None:
+                logger.info("No changed instance left to import: Nothing to do.")
+                return
             logger.info("No instance found: Nothing to do. Exitting")
             sys.exit(1)
         template = self.tmpl.get_template("ec2_import.tf.j2")
 
-        hosted_zone_id = self.get_hosted_zone_id(instance_details[0]["vpc_id"])
-        if hosted_zone_id is None:
+        # Instances terraform already manages need no Route53 lookups either
+        instance_details = [instance for instance in instance_details if not self.runner.is_managed("aws_instance", instance.instance_id)]
+        if not instance_details:
+            logger.info("All instances are already managed by terraform: Nothing to do.")
+            return
+
+        with self.runner.profiler.phase("discovery"):
+            hosted_zone_ids = self.resolve_hosted_zones(instance_details)
+        if not any(hosted_zone_ids.values()):
             logger.error(f"Hosted Route53 Zone doesn't Exist , Please Verify: {self.hosted_zone_name}")
+            if self.resource_ids is not None:
+                return
             sys.exit(1)
 
         for instance in instance_details:
+            hosted_zone_id = hosted_zone_ids.get(instance.vpc_id)
+            if hosted_zone_id is None:
+                logger.warning(f"Skipping Instance {instance.instance_id}, Hosted Route53 Zone {self.hosted_zone_name} is not associated with {instance.vpc_id}")
+                continue
+
             logger.info(f"Importing : {instance}")
 
-            is_dns_exist, record_name = self.check_dns_record(ip=instance["private_ip"], hosted_zone_id=hosted_zone_id)
+            with self.runner.profiler.phase("discovery"):
+                is_dns_exist, record_name = self.check_dns_record(ip=instance.private_ip, hosted_zone_id=hosted_zone_id)
 
             context = {"instance_details": instance, "zone_id": hosted_zone_id, "zone_name": self.hosted_zone_name, "dns_record_name": record_name if is_dns_exist else ""}
 
-            rendered_template = template.render(context)
-
-            output_file_path = f"{self.local_repo_path}/import-{instance['instance_name']}.tf"
-            with open(output_file_path, "w") as f:
-                f.write(rendered_template)
-
-            Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "plan", f"-generate-config-out=generated-plan-import-{instance['instance_name']}.tf"], profile=self.aws_profile)
-            os.rename(output_file_path, f"{output_file_path}.imported")
-            cleanup_tf_plan_file(input_tf_file=f"{self.local_repo_path}/generated-plan-import-{instance['instance_name']}.tf")
-
-        for filename in os.listdir(self.local_repo_path):
-            if filename.endswith(".imported"):
-                new_filename = filename.replace(".imported", "")
-                old_file = os.path.join(self.local_repo_path, filename)
-                new_file = os.path.join(self.local_repo_path, new_filename)
-                os.rename(old_file, new_file)
+            self.runner.import_resource(name=instance.instance_name or instance.instance_id, template=template, context=context, arn=instance.arn)
 
     def set_everything(self):
         """
         Setup the WorkFlow Steps.
         """
-        Utilities.generate_tf_provider(self.local_repo_path, region=self.region)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "init"], profile=self.aws_profile)
+        self.runner.init_workspace()
 
-        instances = self.describe_instance()
+        with self.runner.profiler.phase("discovery"):
+            instances = self.describe_instance()
         self.generate_import_blocks(instances)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "fmt"], profile=self.aws_profile)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "plan"], profile=self.aws_profile)
+        self.runner.finalize()
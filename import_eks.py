@@ -1,11 +1,14 @@
 from utils.utilities import Utilities, SkipTag
-from jinja2 import Environment, FileSystemLoader
 from loguru import logger
-import os
 from botocore.exceptions import ClientError
-from utils.cleanup import cleanup_tf_plan_file
+from utils.import_runner import ImportRunner
+from utils.records import EKSCluster, ExternalASG, NodeGroup
+from utils.pagination import paginate_items
+from concurrent.futures import ThreadPoolExecutor
 import sys
 
+DESCRIBE_WORKERS = 8
+
 
 class EKSImportSetUp:
     """
@@ -13,79 +16,98 @@ class EKSImportSetUp:
     Supoprted resources: EKS, AddOns, ASG, Launch Templates
     """
 
-    def __init__(self, region, resource, local_repo_path, filters, profile):
+    def __init__(self, region, resource, local_repo_path, filters, profile, runner=None, resource_ids=None):
         self.client = Utilities.create_client(region=region, resource=resource, profile=profile)
-        self.tmpl = Environment(loader=FileSystemLoader("templates"))
+        self.tmpl = Utilities.get_template_env()
         self.region = region
         self.aws_profile = profile
         self.local_repo_path = local_repo_path
         self.tag_filters = {key: value for key, value in filters} if filters else {}
+        self.runner = runner or ImportRunner(local_repo_path=local_repo_path, region=region, profile=profile)
+        # Only these resources are discovered when given, IDs from the change feed
+        self.resource_ids = set(resource_ids) if resource_ids is not None else None
 
-    def describe_eks_cluster(self):
+    def get_external_asgs(self):
         """
-        Get Instance details
+        AutoScaling Groups managing Node groups Externally, keyed by cluster name.
+        Those can be searched by Tags k8s.io/cluster-autoscaler/<Cluster Name>: true
         """
+        asg_client = Utilities.create_client(region=self.region, resource="autoscaling", profile=self.aws_profile)
+        external_asgs = {}
+
+        for asg in paginate_items(asg_client, "describe_auto_scaling_groups", "AutoScalingGroups"):
+            for tag in asg["Tags"]:
+                # k8s.io/cluster-autoscaler/enabled is carried by managed node group ASGs as well, it names no cluster
+                if tag["Key"].startswith("k8s.io/cluster-autoscaler/") and tag["Key"] != "k8s.io/cluster-autoscaler/enabled" and tag["Value"] == "true":
+                    cluster_name = tag["Key"].split("/", 2)[-1]
+                    launch_template = asg.get("MixedInstancesPolicy", {}).get("LaunchTemplate", {}).get("LaunchTemplateSpecification") or asg.get("LaunchTemplate", {})
+                    launch_template_id = launch_template.get("LaunchTemplateId")
+                    if launch_template_id is None:
+                        logger.warning(f"Skipping AutoScaling Group {asg['AutoScalingGroupName']} of EKS Cluster {cluster_name}, it has no Launch Template")
+                        continue
+                    external_asgs.setdefault(cluster_name, []).append(ExternalASG(asg_name=asg["AutoScalingGroupName"], launch_template=launch_template_id))
+        return external_asgs
+
+    def describe_cluster(self, cluster_name):
+        """
+        Describe a cluster, returns None if it's skipped by tags. Node group and Add-on names are listed here, described later.
+        """
+        cluster = self.client.describe_cluster(name=cluster_name)["cluster"]
 
-        cluster_names = self.client.list_clusters()["clusters"]
-        cluster_details = []
+        # Retrieve tags for the cluster
+        cluster_tags = self.client.list_tags_for_resource(resourceArn=cluster["arn"])["tags"]
 
-        for cluster_name in cluster_names:
-            cluster = self.client.describe_cluster(name=cluster_name)["cluster"]
+        # Skip instance if TF_IMPORTED tag is set to true
+        if cluster_tags.get("TF_IMPORTED") == SkipTag.TF_IMPORTED.value:
+            logger.info(f"Skipping EKS Cluster  {cluster_name} where TF_IMPORTED tag is set")
+            return None
 
-            # Retrieve tags for the cluster
-            cluster_tags = self.client.list_tags_for_resource(resourceArn=cluster["arn"])["tags"]
+        # Check if the cluster matches the tag filters
+        if not all(cluster_tags.get(key) == value for key, value in self.tag_filters.items()):
+            return None
 
-            # Skip instance if TF_IMPORTED tag is set to true
-            if cluster_tags.get("TF_IMPORTED") == SkipTag.TF_IMPORTED.value:
-                logger.info(f"Skipping EKS Cluster  {cluster_name} where TF_IMPORTED tag is set")
-                continue
+        node_group_names = list(paginate_items(self.client, "list_nodegroups", "nodegroups", clusterName=cluster_name))
+        # list_addons already returns the Add-on names, which is all the template needs
+        addon_names = list(paginate_items(self.client, "list_addons", "addons", clusterName=cluster_name))
+        return cluster, node_group_names, addon_names
+
+    def describe_node_group(self, cluster_name, node_group_name):
+        node_group_info = self.client.describe_nodegroup(clusterName=cluster_name, nodegroupName=node_group_name)["nodegroup"]
+
+        # Retrieve the launch template ID if it exists
+        launch_template_id = node_group_info.get("launchTemplate", {}).get("id", "")
+
+        # Retrieve the ASG names
+        asg_names = [asg["name"] for asg in node_group_info.get("resources", {}).get("autoScalingGroups", [])]
+
+        return NodeGroup(name=node_group_info["nodegroupName"], launch_template=launch_template_id, asg_names=asg_names)
 
-            # Check if the cluster matches the tag filters
-            if all(cluster_tags.get(key) == value for key, value in self.tag_filters.items()):
-                # Retrieve node groups for the cluster
-                node_group_names = self.client.list_nodegroups(clusterName=cluster_name)["nodegroups"]
-                node_groups = []
-
-                for node_group_name in node_group_names:
-                    node_group_info = self.client.describe_nodegroup(clusterName=cluster_name, nodegroupName=node_group_name)["nodegroup"]
-
-                    # Retrieve the launch template ID if it exists
-                    launch_template_id = node_group_info.get("launchTemplate", {}).get("id", "")
-
-                    # Retrieve the ASG names
-                    asg_names = [asg["name"] for asg in node_group_info.get("resources", {}).get("autoScalingGroups", [])]
-
-                    node_group_detail = {"name": node_group_info["nodegroupName"], "launch_template": launch_template_id, "asg_names": asg_names}
-                    node_groups.append(node_group_detail)
-
-                # Handle Case where Node groups are managed Externally By An AutoScaling Group. Those can be searched by Tags k8s.io/cluster-autoscaler/<Cluster Name>: true
-                asg_client = Utilities.create_client(region=self.region, resource="autoscaling", profile=self.aws_profile)
-                paginator = asg_client.get_paginator("describe_auto_scaling_groups")
-                external_asgs = []
-
-                for page in paginator.paginate():
-                    for asg in page["AutoScalingGroups"]:
-                        tags = {tag["Key"]: tag["Value"] for tag in asg["Tags"]}
-                        if tags.get(f"k8s.io/cluster-autoscaler/{cluster_name}") == "true":
-                            launch_template_id = asg["MixedInstancesPolicy"]["LaunchTemplate"]["LaunchTemplateSpecification"]["LaunchTemplateId"]
-                            external_asgs.append({"asg_name": asg["AutoScalingGroupName"], "launch_template": launch_template_id})
-
-                # Retrieve addons for the cluster
-                addon_names = self.client.list_addons(clusterName=cluster_name).get("addons", [])
-                addons = []
-                for addon_name in addon_names:
-                    addon_info = self.client.describe_addon(clusterName=cluster_name, addonName=addon_name)["addon"]
-                    addons.append(addon_info["addonName"])
-
-                cluster_detail = {
-                    "cluster_name": cluster["name"],
-                    "eks_add_ons": addons,
-                    "node_groups": node_groups,
-                    "vpc_id": cluster["resourcesVpcConfig"]["vpcId"],
-                    "security_groups": cluster["resourcesVpcConfig"]["securityGroupIds"],
-                    "iam_role": cluster["roleArn"].split("/")[-1],
-                    "manage_external_asgs": external_asgs,
-                }
+    def describe_eks_cluster(self):
+        """
+        Get Instance details
+        """
+        cluster_names = [cluster_name for cluster_name in paginate_items(self.client, "list_clusters", "clusters") if self.resource_ids is None or cluster_name in self.resource_ids]
+        cluster_details = []
+
+        with ThreadPoolExecutor(max_workers=DESCRIBE_WORKERS) as executor:
+            external_asgs = executor.submit(self.get_external_asgs)
+            clusters = [cluster for cluster in executor.map(self.describe_cluster, cluster_names) if cluster is not None]
+
+            # Fan out the node groups of every cluster on the same pool
+            node_groups = {cluster["name"]: [executor.submit(self.describe_node_group, cluster["name"], node_group_name) for node_group_name in node_group_names] for cluster, node_group_names, _ in clusters}
+            external_asgs = external_asgs.result()
+
+            for cluster, _, addon_names in clusters:
+                cluster_detail = EKSCluster(
+                    cluster_name=cluster["name"],
+                    eks_add_ons=addon_names,
+                    node_groups=[node_group.result() for node_group in node_groups[cluster["name"]]],
+                    vpc_id=cluster["resourcesVpcConfig"]["vpcId"],
+                    security_groups=cluster["resourcesVpcConfig"]["securityGroupIds"],
+                    iam_role=cluster["roleArn"].split("/")[-1],
+                    manage_external_asgs=external_asgs.get(cluster["name"], []),
+                    arn=cluster["arn"],
+                )
                 cluster_details.append(cluster_detail)
 
         logger.info(f"Total EKS Cluster Found: { len(cluster_details) }")
@@ -97,41 +119,30 @@ class EKSImportSetUp:
         Generate Import Blocks, Generate Terraform code, Cleanup Terraform code
         """
         if not eks_cluster_details:
+            if self.resource_ids is not None:
+                logger.info("No changed EKS Cluster left to import: Nothing to do.")
+                return
             logger.info("No EKS Cluster found: Nothing to do. Exitting")
             sys.exit(1)
 
         template = self.tmpl.get_template("eks_import.tf.j2")
 
         for eks_cluster in eks_cluster_details:
+            if self.runner.is_managed("aws_eks_cluster", eks_cluster.cluster_name):
+                continue
             logger.info(f"Importing : {eks_cluster}")
 
-            context = {"cluster_name": eks_cluster["cluster_name"], "eks_add_ons": eks_cluster["eks_add_ons"], "node_groups": eks_cluster["node_groups"], "manage_external_asgs": eks_cluster["manage_external_asgs"]}
-
-            rendered_template = template.render(context)
-
-            output_file_path = f"{self.local_repo_path}/import-{eks_cluster['cluster_name']}.tf"
-            with open(output_file_path, "w") as f:
-                f.write(rendered_template)
-
-            Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "plan", f"-generate-config-out=generated-plan-import-{eks_cluster['cluster_name']}.tf"], profile=self.aws_profile)
-            os.rename(output_file_path, f"{output_file_path}.imported")
-            cleanup_tf_plan_file(input_tf_file=f"{self.local_repo_path}/generated-plan-import-{eks_cluster['cluster_name']}.tf")
+            context = {"cluster_name": eks_cluster.cluster_name, "eks_add_ons": eks_cluster.eks_add_ons, "node_groups": eks_cluster.node_groups, "manage_external_asgs": eks_cluster.manage_external_asgs}
 
-        for filename in os.listdir(self.local_repo_path):
-            if filename.endswith(".imported"):
-                new_filename = filename.replace(".imported", "")
-                old_file = os.path.join(self.local_repo_path, filename)
-                new_file = os.path.join(self.local_repo_path, new_filename)
-                os.rename(old_file, new_file)
+            self.runner.import_resource(name=eks_cluster.cluster_name, template=template, context=context, arn=eks_cluster.arn)
 
     def set_everything(self):
         """
         Setup the WorkFlow Steps.
         """
-        Utilities.generate_tf_provider(self.local_repo_path, region=self.region)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "init"], profile=self.aws_profile)
+        self.runner.init_workspace()
 
-        eks_clusters = self.describe_eks_cluster()
+        with self.runner.profiler.phase("discovery"):
+            eks_clusters = self.describe_eks_cluster()
         self.generate_import_blocks(eks_clusters)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "fmt"], profile=self.aws_profile)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "plan"], profile=self.aws_profile)
+        self.runner.finalize()
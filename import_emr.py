@@ -1,38 +1,46 @@
 from utils.utilities import Utilities, SkipTag
-from jinja2 import Environment, FileSystemLoader
 from loguru import logger
-import os
-from utils.cleanup import cleanup_tf_plan_file
+from utils.import_runner import ImportRunner
+from utils.records import EMRCluster
+from utils.pagination import paginate_items
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import warnings
 warnings.filterwarnings('ignore', category=FutureWarning, module='botocore.client')
 
+ACTIVE_CLUSTER_STATES = ["STARTING", "BOOTSTRAPPING", "RUNNING", "WAITING"]
+DESCRIBE_WORKERS = 8
+
+
 class EMRImportSetUp:
     """
     Import Block for EMR Import.
     """
 
-    def __init__(self, region, resource, local_repo_path, filters, profile):
+    def __init__(self, region, resource, local_repo_path, filters, profile, runner=None, resource_ids=None):
         self.client = Utilities.create_client(region=region, resource=resource, profile=profile)
-        self.tmpl = Environment(loader=FileSystemLoader("templates"))
+        self.tmpl = Utilities.get_template_env()
         self.region = region
         self.aws_profile = profile
         self.local_repo_path = local_repo_path
         self.tag_filters = {key: value for key, value in filters} if filters else {}
+        self.runner = runner or ImportRunner(local_repo_path=local_repo_path, region=region, profile=profile)
+        # Only these resources are discovered when given, IDs from the change feed
+        self.resource_ids = set(resource_ids) if resource_ids is not None else None
 
     def describe_emr_cluster(self):
         """
         Get EMR details
         """
 
-        # Retrieve a list of clusters
-        clusters = self.client.list_clusters()["Clusters"]
+        # Retrieve active clusters only, terminated ones are filtered server side
+        cluster_ids = [cluster["Id"] for cluster in paginate_items(self.client, "list_clusters", "Clusters", ClusterStates=ACTIVE_CLUSTER_STATES) if self.resource_ids is None or cluster["Id"] in self.resource_ids]
         cluster_details = []
 
-        for cluster in clusters:
-            cluster_id = cluster["Id"]
-            cluster_info = self.client.describe_cluster(ClusterId=cluster_id)["Cluster"]
+        with ThreadPoolExecutor(max_workers=DESCRIBE_WORKERS) as executor:
+            cluster_infos = list(executor.map(lambda cluster_id: self.client.describe_cluster(ClusterId=cluster_id)["Cluster"], cluster_ids))
 
+        for cluster_info in cluster_infos:
             # Retrieve tags from the cluster information
             cluster_tags = {tag['Key']: tag['Value'] for tag in cluster_info.get("Tags", [])}
 
@@ -43,10 +51,7 @@ class EMRImportSetUp:
 
             # Check if the cluster matches the tag filters
             if all(cluster_tags.get(key) == value for key, value in self.tag_filters.items()):
-                cluster_detail = {
-                    "cluster_name": cluster_info["Name"],
-                    "cluster_id": cluster_info["Id"],
-                }
+                cluster_detail = EMRCluster(cluster_name=cluster_info["Name"], cluster_id=cluster_info["Id"], arn=cluster_info["ClusterArn"])
                 cluster_details.append(cluster_detail)
 
         logger.info(f"Total EMR Clusters Found: {len(cluster_details)}")
@@ -57,44 +62,33 @@ class EMRImportSetUp:
         Generate Import Blocks, Generate Terraform code, Cleanup Terraform code
         """
         if not emr_cluster_details:
+            if self.resource_ids is not None:
+                logger.info("No changed EMR Cluster left to import: Nothing to do.")
+                return
             logger.info("No EMR Cluster found: Nothing to do. Exitting")
             sys.exit(1)
 
         template = self.tmpl.get_template("emr_import.tf.j2")
 
         for emr_cluster in emr_cluster_details:
+            if self.runner.is_managed("aws_emr_cluster", emr_cluster.cluster_id):
+                continue
             logger.info(f"Importing : {emr_cluster}")
 
             context = {
-                        "cluster_name": emr_cluster["cluster_name"],
-                        "cluster_id": emr_cluster["cluster_id"],
+                        "cluster_name": emr_cluster.cluster_name,
+                        "cluster_id": emr_cluster.cluster_id,
                     }
 
-            rendered_template = template.render(context)
-
-            output_file_path = f"{self.local_repo_path}/import-{emr_cluster['cluster_name']}.tf"
-            with open(output_file_path, "w") as f:
-                f.write(rendered_template)
-
-            Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "plan", f"-generate-config-out=generated-plan-import-{emr_cluster['cluster_name']}.tf"], profile=self.aws_profile)
-            os.rename(output_file_path, f"{output_file_path}.imported")
-            cleanup_tf_plan_file(input_tf_file=f"{self.local_repo_path}/generated-plan-import-{emr_cluster['cluster_name']}.tf")
-
-        for filename in os.listdir(self.local_repo_path):
-            if filename.endswith(".imported"):
-                new_filename = filename.replace(".imported", "")
-                old_file = os.path.join(self.local_repo_path, filename)
-                new_file = os.path.join(self.local_repo_path, new_filename)
-                os.rename(old_file, new_file)
+            self.runner.import_resource(name=emr_cluster.cluster_name, template=template, context=context, arn=emr_cluster.arn)
 
     def set_everything(self):
         """
         Setup the WorkFlow Steps.
         """
-        Utilities.generate_tf_provider(self.local_repo_path, region=self.region)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "init"], profile=self.aws_profile)
+        self.runner.init_workspace()
 
-        emr_clusters = self.describe_emr_cluster()
+        with self.runner.profiler.phase("discovery"):
+            emr_clusters = self.describe_emr_cluster()
         self.generate_import_blocks(emr_clusters)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "fmt"], profile=self.aws_profile)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "plan"], profile=self.aws_profile)
\ No newline at end of file
+        self.runner.finalize()
\ No newline at end of file
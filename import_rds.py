@@ -1,9 +1,10 @@
 from utils.utilities import Utilities, SkipTag
-from jinja2 import Environment, FileSystemLoader
 from loguru import logger
 import sys
-import os
-from utils.cleanup import cleanup_tf_plan_file
+from concurrent.futures import ThreadPoolExecutor
+from utils.import_runner import ImportRunner
+from utils.records import RDSCluster, RDSClusterMember, RDSInstance
+from utils.pagination import paginate_items
 from botocore.exceptions import ClientError
 
 
@@ -13,187 +14,188 @@ class RDSImportSetUp:
     Supoprted resources: RDS Cluster, RDS Instance, Security Groups, KMS, Parameter Group, Option Group
     """
 
-    def __init__(self, region, resource, local_repo_path, filters, profile):
+    def __init__(self, region, resource, local_repo_path, filters, profile, runner=None, resource_ids=None):
         self.client = Utilities.create_client(region=region, resource=resource, profile=profile)
-        self.tmpl = Environment(loader=FileSystemLoader("templates"))
+        self.tmpl = Utilities.get_template_env()
         self.region = region
         self.aws_profile = profile
         self.local_repo_path = local_repo_path
         self.tag_filters = {key: value for key, value in filters} if filters else {}
+        self.key_managers = {}
+        self.runner = runner or ImportRunner(local_repo_path=local_repo_path, region=region, profile=profile)
+        # Only these resources are discovered when given, IDs from the change feed
+        self.resource_ids = set(resource_ids) if resource_ids is not None else None
 
     def get_key_manager(self, key_id):
         """
         Determine if a KMS key is AWS-managed or customer-managed.
 
         :param key_id: The ID or ARN of the KMS key
-        :return: 'AWS' if the key is AWS-managed, 'CUSTOMER' if user-managed, or None if the key is not found
+        :return: the key ID if the key is customer managed, None otherwise. Cached per key, databases often share keys
         """
-        kms_client = Utilities.create_client(region=self.region, resource="kms", profile=self.aws_profile)
+        if key_id in self.key_managers:
+            return self.key_managers[key_id]
 
+        kms_client = Utilities.create_client(region=self.region, resource="kms", profile=self.aws_profile)
+        customer_key_id = None
         try:
             response = kms_client.describe_key(KeyId=key_id)
             key_manager = response["KeyMetadata"]["KeyManager"]
             if key_manager == "CUSTOMER":
-                return key_id
+                customer_key_id = key_id
 
         except ClientError as e:
             print(f"Error retrieving key details: {e}")
-            return None
 
-    def get_rds_instances(self):
-        """Retrieve all RDS instances."""
+        self.key_managers[key_id] = customer_key_id
+        return customer_key_id
 
-        instances = []
-        paginator = self.client.get_paginator("describe_db_instances")
-        for page in paginator.paginate():
-            for db_instance in page["DBInstances"]:
-                db_instance_arn = db_instance["DBInstanceArn"]
-                # Get tags for the instance
-                tags_response = self.client.list_tags_for_resource(ResourceName=db_instance_arn)
-                tags = {tag["Key"]: tag["Value"] for tag in tags_response["TagList"]}
-
-                # Skip instance if TF_IMPORTED tag is set to true
-                if tags.get("TF_IMPORTED") == SkipTag.TF_IMPORTED.value:
-                    logger.info(f'Skipping RDS Instance {db_instance["DBInstanceIdentifier"]} where TF_IMPORTED tag is set')
-                    continue
+    def get_kms_key_id(self, db_resource):
+        """
+        Customer managed KMS key ID of an encrypted DB instance or cluster, empty string otherwise.
+        """
+        if "KmsKeyId" not in db_resource:
+            return ""
+        kms_key_id = self.get_key_manager(db_resource["KmsKeyId"].split("/")[-1])
+        return kms_key_id if kms_key_id is not None else ""
+
+    def is_selected(self, kind, identifier, tag_list):
+        """
+        Check the TagList embedded in the describe response against TF_IMPORTED and the tag filters.
+        """
+        if self.resource_ids is not None and identifier not in self.resource_ids:
+            return False
+
+        tags = {tag["Key"]: tag["Value"] for tag in tag_list}
+
+        # Skip instance if TF_IMPORTED tag is set to true
+        if tags.get("TF_IMPORTED") == SkipTag.TF_IMPORTED.value:
+            logger.info(f"Skipping RDS {kind} {identifier} where TF_IMPORTED tag is set")
+            return False
+
+        return all(tags.get(key) == value for key, value in self.tag_filters.items())
+
+    def list_db_instances(self):
+        return list(paginate_items(self.client, "describe_db_instances", "DBInstances"))
+
+    def list_db_clusters(self):
+        return list(paginate_items(self.client, "describe_db_clusters", "DBClusters"))
 
-                # Check if the instance matches all tag filters:
-                if "DBClusterIdentifier" not in db_instance:
-                    if all(tags.get(key) == value for key, value in self.tag_filters.items()):
-                        kms_key_id = self.get_key_manager(db_instance["KmsKeyId"].split("/")[-1])
-                        security_groups = [sg["VpcSecurityGroupId"] for sg in db_instance["VpcSecurityGroups"]]
-                        option_group_names = [og["OptionGroupName"] for og in db_instance.get("OptionGroupMemberships", [])]
-
-                        instance_info = {
-                            "kms_key_id": kms_key_id if kms_key_id is not None else "",
-                            "identifier": db_instance["DBInstanceIdentifier"],
-                            "is_aurora": "true" if db_instance["Engine"].startswith("aurora") else "false",
-                            "db_parameter_groups": [pg["DBParameterGroupName"] for pg in db_instance["DBParameterGroups"]],
-                            "security_groups": security_groups,
-                            "option_groups": option_group_names,
-                        }
-                        instances.append(instance_info)
+    def get_rds_instances(self, db_instances):
+        """Standalone RDS instances, cluster members are imported with their cluster."""
+
+        instances = []
+        for db_instance in db_instances:
+            if "DBClusterIdentifier" in db_instance:
+                continue
+            if not self.is_selected("Instance", db_instance["DBInstanceIdentifier"], db_instance.get("TagList", [])):
+                continue
+
+            instance_info = RDSInstance(
+                kms_key_id=self.get_kms_key_id(db_instance),
+                identifier=db_instance["DBInstanceIdentifier"],
+                is_aurora="true" if db_instance["Engine"].startswith("aurora") else "false",
+                db_parameter_groups=[pg["DBParameterGroupName"] for pg in db_instance["DBParameterGroups"]],
+                security_groups=[sg["VpcSecurityGroupId"] for sg in db_instance["VpcSecurityGroups"]],
+                option_groups=[og["OptionGroupName"] for og in db_instance.get("OptionGroupMemberships", [])],
+                arn=db_instance["DBInstanceArn"],
+            )
+            instances.append(instance_info)
 
         logger.info(f"Total RDS Instance Found: { len(instances) }")
 
         return instances
 
-    def get_rds_clusters(self):
-        """Retrieve all RDS clusters."""
+    def get_rds_clusters(self, db_clusters, db_instances):
+        """RDS clusters, members are taken from the instance listing instead of a describe call per member."""
 
+        instances_by_identifier = {db_instance["DBInstanceIdentifier"]: db_instance for db_instance in db_instances}
         clusters = []
-        paginator = self.client.get_paginator("describe_db_clusters")
-        for page in paginator.paginate():
-            for db_cluster in page["DBClusters"]:
-                db_cluster_arn = db_cluster["DBClusterArn"]
-
-                # Get tags for the instance
-                tags_response = self.client.list_tags_for_resource(ResourceName=db_cluster_arn)
-                tags = {tag["Key"]: tag["Value"] for tag in tags_response["TagList"]}
-
-                # Skip instance if TF_IMPORTED tag is set to true
-                if tags.get("TF_IMPORTED") == SkipTag.TF_IMPORTED.value:
-                    logger.info(f'Skipping RDS Cluster {db_cluster["DBClusterIdentifier"]} where TF_IMPORTED tag is set')
+        for db_cluster in db_clusters:
+            if not self.is_selected("Cluster", db_cluster["DBClusterIdentifier"], db_cluster.get("TagList", [])):
+                continue
+
+            # Get cluster instances and their parameter groups
+            cluster_instances = []
+            for member in db_cluster["DBClusterMembers"]:
+                instance = instances_by_identifier.get(member["DBInstanceIdentifier"])
+                if instance is None:
                     continue
-
-                # Check if the instance matches all tag filters
-                if all(tags.get(key) == value for key, value in self.tag_filters.items()):
-                    security_groups = [sg["VpcSecurityGroupId"] for sg in db_cluster["VpcSecurityGroups"]]
-
-                    # Get cluster instances and their parameter groups
-                    cluster_instances = []
-                    for instance_identifier in db_cluster["DBClusterMembers"]:
-                        instance_info = self.client.describe_db_instances(DBInstanceIdentifier=instance_identifier["DBInstanceIdentifier"])
-                        for instance in instance_info["DBInstances"]:
-                            instance_data = {
-                                "instance_identifier": instance["DBInstanceIdentifier"],
-                                "db_parameter_group": [param_group["DBParameterGroupName"] for param_group in instance["DBParameterGroups"]],
-                                "option_groups": [og["OptionGroupName"] for og in instance.get("OptionGroupMemberships", [])],
-                            }
-                            cluster_instances.append(instance_data)
-                    
-                    kms_key_id = self.get_key_manager(db_cluster["KmsKeyId"].split("/")[-1])
-
-                    cluster_info = {
-                        "kms_key_id": kms_key_id if kms_key_id is not None else "",
-                        "identifier": db_cluster["DBClusterIdentifier"],
-                        "is_aurora": "true" if db_cluster["Engine"].startswith("aurora") else "false",
-                        "cluster_parameter": db_cluster["DBClusterParameterGroup"],
-                        "security_groups": security_groups,
-                        "cluster_instances": cluster_instances,
-                    }
-                    clusters.append(cluster_info)
+                instance_data = RDSClusterMember(
+                    instance_identifier=instance["DBInstanceIdentifier"],
+                    db_parameter_group=[param_group["DBParameterGroupName"] for param_group in instance["DBParameterGroups"]],
+                    option_groups=[og["OptionGroupName"] for og in instance.get("OptionGroupMemberships", [])],
+                )
+                cluster_instances.append(instance_data)
+
+            cluster_info = RDSCluster(
+                kms_key_id=self.get_kms_key_id(db_cluster),
+                identifier=db_cluster["DBClusterIdentifier"],
+                is_aurora="true" if db_cluster["Engine"].startswith("aurora") else "false",
+                cluster_parameter=db_cluster["DBClusterParameterGroup"],
+                security_groups=[sg["VpcSecurityGroupId"] for sg in db_cluster["VpcSecurityGroups"]],
+                cluster_instances=cluster_instances,
+                arn=db_cluster["DBClusterArn"],
+            )
+            clusters.append(cluster_info)
         logger.info(f"Total RDS Clusters Found: { len(clusters) }")
         return clusters
 
+    def describe_rds(self):
+        """
+        List DB clusters and DB instances concurrently, one paginated describe call each.
+        Tags come embedded in the describe responses.
+        """
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            db_clusters = executor.submit(self.list_db_clusters)
+            db_instances = executor.submit(self.list_db_instances)
+            db_clusters, db_instances = db_clusters.result(), db_instances.result()
+
+        return self.get_rds_clusters(db_clusters, db_instances), self.get_rds_instances(db_instances)
+
     def generate_import_blocks(self, db_instances=[], db_clusters=[]):
         if not db_clusters and not db_instances:
+            if self.resource_ids is not None:
+                logger.info("No changed RDS Instance or Cluster left to import: Nothing to do.")
+                return
             logger.info("No Cluster found: Nothing to do. Exitting")
             sys.exit(1)
 
         template = self.tmpl.get_template("rds_import.tf.j2")
 
         for cluster in db_clusters:
+            if self.runner.is_managed("aws_rds_cluster", cluster.identifier):
+                continue
             logger.info(f"Importing : {cluster}")
-            output_file_path = f"{self.local_repo_path}/import-cluster-{cluster['identifier']}.tf"
             context = {
-                "rds_cluster_identifier": cluster["identifier"],
-                "cluster_parameter": cluster["cluster_parameter"],
-                "cluster_instances": cluster["cluster_instances"],
-                "kms_key_id": cluster["kms_key_id"],
+                "rds_cluster_identifier": cluster.identifier,
+                "cluster_parameter": cluster.cluster_parameter,
+                "cluster_instances": cluster.cluster_instances,
+                "kms_key_id": cluster.kms_key_id,
                 "is_cluster": "true",
-                "is_aurora": cluster["is_aurora"],
+                "is_aurora": cluster.is_aurora,
             }
 
-            rendered_template = template.render(context)
-
-            with open(output_file_path, "w") as f:
-                f.write(rendered_template)
-
-            Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "plan", f"-generate-config-out=generated-plan-import-{cluster['identifier']}_cluster.tf"])
-            os.rename(output_file_path, f"{output_file_path}.imported")
-            cleanup_tf_plan_file(input_tf_file=f"{self.local_repo_path}/generated-plan-import-{cluster['identifier']}_cluster.tf")
-
-        for filename in os.listdir(self.local_repo_path):
-            if filename.endswith(".imported"):
-                new_filename = filename.replace(".imported", "")
-                old_file = os.path.join(self.local_repo_path, filename)
-                new_file = os.path.join(self.local_repo_path, new_filename)
-                os.rename(old_file, new_file)
+            self.runner.import_resource(name=f"cluster-{cluster.identifier}", template=template, context=context, generated_name=f"{cluster.identifier}_cluster", arn=cluster.arn)
 
         for instance in db_instances:
+            if self.runner.is_managed("aws_db_instance", instance.identifier):
+                continue
             logger.info(f"Importing Instance: {instance}")
-            output_file_path = f"{self.local_repo_path}/import-instance-{instance['identifier']}.tf"
 
             context = {
-                "instance_identifier": instance["identifier"],
-                "db_parameter_groups": instance["db_parameter_groups"],
-                "kms_key_id": instance["kms_key_id"],
+                "instance_identifier": instance.identifier,
+                "db_parameter_groups": instance.db_parameter_groups,
+                "kms_key_id": instance.kms_key_id,
                 "is_aurora": "false",
                 "is_cluster": "false",
-                "option_groups": instance["option_groups"]
+                "option_groups": instance.option_groups
             }
-            rendered_template = template.render(context)
-
-            with open(output_file_path, "w") as f:
-                f.write(rendered_template)
-
-            Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "plan", f"-generate-config-out=generated-plan-import-{instance['identifier']}_instance.tf"], profile=self.aws_profile)
-            os.rename(output_file_path, f"{output_file_path}.imported")
-            cleanup_tf_plan_file(input_tf_file=f"{self.local_repo_path}/generated-plan-import-{instance['identifier']}_instance.tf")
-
-        for filename in os.listdir(self.local_repo_path):
-            if filename.endswith(".imported"):
-                new_filename = filename.replace(".imported", "")
-                old_file = os.path.join(self.local_repo_path, filename)
-                new_file = os.path.join(self.local_repo_path, new_filename)
-                os.rename(old_file, new_file)
+            self.runner.import_resource(name=f"instance-{instance.identifier}", template=template, context=context, generated_name=f"{instance.identifier}_instance", arn=instance.arn)
 
     def set_everything(self):
-        Utilities.generate_tf_provider(self.local_repo_path, region=self.region)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "init"], profile=self.aws_profile)
-        clusters = self.get_rds_clusters()
-        instances = self.get_rds_instances()
+        self.runner.init_workspace()
+        with self.runner.profiler.phase("discovery"):
+            clusters, instances = self.describe_rds()
         self.generate_import_blocks(db_instances=instances, db_clusters=clusters)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "fmt"], profile=self.aws_profile)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "plan"], profile=self.aws_profile)
+        self.runner.finalize()
@@ -1,9 +1,8 @@
 from utils.utilities import Utilities, SkipTag
-from jinja2 import Environment, FileSystemLoader
 from loguru import logger
-import os
 from botocore.exceptions import ClientError
-from utils.cleanup import cleanup_tf_plan_file
+from utils.import_runner import ImportRunner
+from utils.records import BucketFeature, S3Bucket
 import sys
 
 
@@ -13,20 +12,23 @@ class S3ImportSetUp:
     Supoprted resources: S3 Bucket
     """
 
-    def __init__(self, region, resource, local_repo_path, filters, profile):
+    def __init__(self, region, resource, local_repo_path, filters, profile, runner=None, resource_ids=None):
         self.client = Utilities.create_client(region=region, resource=resource, profile=profile)
-        self.tmpl = Environment(loader=FileSystemLoader("templates"))
+        self.tmpl = Utilities.get_template_env()
         self.region = region
         self.aws_profile = profile
         self.local_repo_path = local_repo_path
         self.tag_filters = {key: value for key, value in filters} if filters else {}
+        self.runner = runner or ImportRunner(local_repo_path=local_repo_path, region=region, profile=profile)
+        # Only these resources are discovered when given, IDs from the change feed
+        self.resource_ids = set(resource_ids) if resource_ids is not None else None
 
     def describe_s3_buckets(self):
         """
         Get details for all S3 Buckets, filtered by tags
         """
         # Retrieve the list of load balancers
-        s3_buckets = self.client.list_buckets()["Buckets"]
+        s3_buckets = [bucket for bucket in self.client.list_buckets()["Buckets"] if self.resource_ids is None or bucket["Name"] in self.resource_ids]
 
         s3_bucket_details = []
         tags = {}
@@ -52,29 +54,20 @@ class S3ImportSetUp:
             if tags.get('TF_IMPORTED', 'false').lower() == 'true':
                 continue
 
-            bucket_detail = {
-                "bucket_name": bucket_name,
-                "bucket_policy": False,
-                "bucket_acl": False,
-                "bucket_versioning": False,
-                "bucket_lifecycle_rule": False,
-                "bucket_intelligent_tiering": False,
-                "bucket_cors_config": False,
-                "bucket_replication_config": False,
-                "bucket_server_side_encryption": False,
-            }
+            bucket_detail = S3Bucket(bucket_name=bucket_name)
 
             # Check if the bucket has a policy
             try:
                 self.client.get_bucket_policy(Bucket=bucket_name)
-                bucket_detail["bucket_policy"] = True
+                bucket_detail.features |= BucketFeature.POLICY
             except ClientError:
                 pass  # Bucket has no policy
 
             # Check if the bucket has ACL
             try:
                 acl = self.client.get_bucket_acl(Bucket=bucket_name)
-                bucket_detail["bucket_acl"] = bool(acl)
+                if acl:
+                    bucket_detail.features |= BucketFeature.ACL
             except ClientError:
                 pass
 
@@ -82,42 +75,47 @@ class S3ImportSetUp:
             try:
                 versioning = self.client.get_bucket_versioning(Bucket=bucket_name)
                 if versioning.get("Status") == "Enabled":
-                    bucket_detail["bucket_versioning"] = True
+                    bucket_detail.features |= BucketFeature.VERSIONING
             except ClientError:
                 pass
 
             # Check if the bucket has a lifecycle configuration
             try:
                 lifecycle = self.client.get_bucket_lifecycle_configuration(Bucket=bucket_name)
-                bucket_detail["bucket_lifecycle_rule"] = bool(lifecycle["Rules"])
+                if lifecycle["Rules"]:
+                    bucket_detail.features |= BucketFeature.LIFECYCLE_RULE
             except ClientError:
                 pass
 
             # Check if the bucket has a Intelligent tiering configuration
             try:
                 intelligent_tiering = self.client.list_bucket_intelligent_tiering_configurations(Bucket=bucket_name)
-                bucket_detail["bucket_intelligent_tiering"] = bool(intelligent_tiering.get('IntelligentTieringConfigurationList'))
+                if intelligent_tiering.get('IntelligentTieringConfigurationList'):
+                    bucket_detail.features |= BucketFeature.INTELLIGENT_TIERING
             except ClientError:
                 pass
 
             # Check if the bucket has a cors configuration
             try:
                 cors = self.client.get_bucket_cors(Bucket=bucket_name)
-                bucket_detail["bucket_cors_config"] = bool(cors.get('CORSRules'))
+                if cors.get('CORSRules'):
+                    bucket_detail.features |= BucketFeature.CORS_CONFIG
             except ClientError:
                 pass
 
             # Check if the bucket has replication configuration
             try:
                 replication = self.client.get_bucket_replication(Bucket=bucket_name)
-                bucket_detail["bucket_replication_config"] =  bool(replication.get('ReplicationConfiguration'))
+                if replication.get('ReplicationConfiguration'):
+                    bucket_detail.features |= BucketFeature.REPLICATION_CONFIG
             except ClientError:
                 pass
 
             # Check if the bucket has server side encryption configuration
             try:
                 encryption = self.client.get_bucket_encryption(Bucket=bucket_name)
-                bucket_detail["bucket_server_side_encryption"] = bool(encryption.get('ServerSideEncryptionConfiguration'))
+                if encryption.get('ServerSideEncryptionConfiguration'):
+                    bucket_detail.features |= BucketFeature.SERVER_SIDE_ENCRYPTION
             except ClientError:
                 pass
 
@@ -135,52 +133,30 @@ class S3ImportSetUp:
         Generate Import Blocks, Generate Terraform code, Cleanup Terraform code
         """
         if not s3_bucket_details:
+            if self.resource_ids is not None:
+                logger.info("No changed S3 Bucket left to import: Nothing to do.")
+                return
             logger.info("No S3 Bucket found: Nothing to do. Exitting")
             sys.exit(1)
 
         template = self.tmpl.get_template("s3_import.tf.j2")
 
         for bucket in s3_bucket_details:
+            if self.runner.is_managed("aws_s3_bucket", bucket.bucket_name):
+                continue
             logger.info(f"Importing : {bucket}")
 
-            context = {
-                "bucket_name": bucket["bucket_name"],
-                "bucket_policy": bucket["bucket_policy"],
-                "bucket_acl": bucket["bucket_acl"],
-                "bucket_versioning": bucket["bucket_versioning"],
-                "bucket_lifecycle_rule": bucket["bucket_lifecycle_rule"],
-                "bucket_intelligent_tiering": bucket["bucket_intelligent_tiering"],
-                "bucket_cors_config": bucket["bucket_cors_config"],
-                "bucket_server_side_encryption": bucket["bucket_server_side_encryption"],
-                "bucket_replication_config": bucket["bucket_replication_config"]
-            }
-
-            rendered_template = template.render(context)
-
-            output_file_path = f"{self.local_repo_path}/import-{bucket['bucket_name']}.tf"
-            with open(output_file_path, "w") as f:
-                f.write(rendered_template)
-
-            Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "plan", f"-generate-config-out=generated-plan-import-{bucket['bucket_name']}.tf"], profile=self.aws_profile)
-
-            os.rename(output_file_path, f"{output_file_path}.imported")
-            cleanup_tf_plan_file(input_tf_file=f"{self.local_repo_path}/generated-plan-import-{bucket['bucket_name']}.tf")
+            context = {"bucket_name": bucket.bucket_name, **bucket.template_flags()}
 
-        for filename in os.listdir(self.local_repo_path):
-            if filename.endswith(".imported"):
-                new_filename = filename.replace(".imported", "")
-                old_file = os.path.join(self.local_repo_path, filename)
-                new_file = os.path.join(self.local_repo_path, new_filename)
-                os.rename(old_file, new_file)
+            self.runner.import_resource(name=bucket.bucket_name, template=template, context=context, arn=f"arn:{self.client.meta.partition}:s3:::{bucket.bucket_name}")
 
     def set_everything(self):
         """
         Setup the WorkFlow Steps.
         """
-        Utilities.generate_tf_provider(self.local_repo_path, region=self.region)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "init"], profile=self.aws_profile)
+        self.runner.init_workspace()
 
-        s3_bucket_details = self.describe_s3_buckets()
+        with self.runner.profiler.phase("discovery"):
+            s3_bucket_details = self.describe_s3_buckets()
         self.generate_import_blocks(s3_bucket_details)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "fmt"], profile=self.aws_profile)
-        Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", "plan"], profile=self.aws_profile)
\ No newline at end of file
+        self.runner.finalize()
\ No newline at end of file
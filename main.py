@@ -1,48 +1,75 @@
 #!/usr/bin/env python3
 import argparse
-from import_ec2 import EC2ImportSetUp
-from import_rds import RDSImportSetUp
-from import_eks import EKSImportSetUp
-from import_alb import ALBImportSetUp
-from import_s3  import S3ImportSetUp
-from import_emr import EMRImportSetUp
+import sys
+from utils.registry import IMPORTERS, IMPORTER_ARGS, get_importer
 
 
-from loguru import logger
-
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="TF Import Script")
-    parser.add_argument("--resource", dest="resource", help="Resource Type ", type=str, required=True)
+    parser.add_argument("--resource", dest="resource", help="Resource Type ", type=str, required=True, choices=sorted(IMPORTERS))
     parser.add_argument("--local-repo-path", dest="local_repo_path", help="Local Repo Path", type=str, required=True)
     parser.add_argument("--region", dest="region", help="AWS Region", type=str, required=True)
     parser.add_argument("--profile", dest="profile", help="AWS Access Profile name", type=str, required=False, default="default")
     parser.add_argument("--hosted-zone-name", dest="hosted_zone_name", help="AWS Route53 hosted Zone", type=str)
     parser.add_argument("--tag", action="append", nargs=2, metavar=("key", "value"), help="Specify a tag filter as key value pair, e.g. -t TF_MANAGED true -t env dev")
+    parser.add_argument("--render-only", dest="render_only", action="store_true", help="Only discover resources and render import blocks with a manifest, no terraform commands are run")
+    parser.add_argument(
+        "--plan-chunk-size", dest="plan_chunk_size", help="Generate config for this many resources per terraform plan, adapted to the observed plan time. Failing chunks are bisected and failing resources quarantined", type=int
+    )
+    parser.add_argument("--skip-unchanged", dest="skip_unchanged", action="store_true", help="Skip resources whose template context, template, cleanup rules and generated files are unchanged since they were last imported")
+    parser.add_argument("--import-format", dest="import_format", choices=("hcl", "json"), default="hcl", help="Write import blocks as HCL rendered from the templates, or as .tf.json emitted directly")
+    parser.add_argument("--link-references", dest="link_references", action="store_true", help="Rewrite hard coded IDs and ARNs of resources imported in the workspace into references in the generated config")
+    parser.add_argument("--tag-imported", dest="tag_imported", action="store_true", help="Tag the resources planned in this run with TF_IMPORTED=true in batches, so later runs skip them")
+    parser.add_argument("--plan-workers", dest="plan_workers", help="Shard the final plan of the imported resources over this many parallel terraform plans", type=int, default=1)
+    parser.add_argument("--output-layout", dest="output_layout", choices=("per-resource", "sharded"), default="per-resource", help="One import and one generated file per resource, or files grouped by resource type with a shard manifest")
+    parser.add_argument("--shard-size-kb", dest="shard_size_kb", help="Maximum size of a sharded output file in KB", type=int, default=512)
+    parser.add_argument("--profile-run", dest="profile_run", nargs="+", choices=("cpu", "memory"), help="Profile each phase (discovery, render, plan, cleanup, fmt) with cProfile and/or tracemalloc")
+    parser.add_argument("--profile-dir", dest="profile_dir", help="Directory for the .prof files and allocation reports, defaults to <local-repo-path>/profile", type=str)
+    parser.add_argument(
+        "--change-feed", dest="change_feed", help="Only discover resources created or modified since the last successful run, from CloudTrail event records: a log file, a directory of log files or a JSON lines file", type=str
+    )
+    parser.add_argument("--record-cassette", dest="record_cassette", help="Record every AWS call of the run into this gzip compressed, redacted cassette file", type=str)
+    parser.add_argument("--replay-cassette", dest="replay_cassette", help="Answer AWS calls from this cassette file offline instead of calling AWS", type=str)
+    parser.add_argument("--replay-latency", dest="replay_latency", help="Simulated latency in seconds per replayed AWS call", type=float, default=0.0)
     args = parser.parse_args()
 
-    if args.resource == "ec2" and not args.hosted_zone_name:
-        parser.error("--hosted-zone-name is required when resource is 'ec2'")
-
-    if args.resource == "ec2":
-        ec2_import = EC2ImportSetUp(region=args.region, resource=args.resource, local_repo_path=args.local_repo_path, hosted_zone_name=args.hosted_zone_name, filters=args.tag, profile=args.profile)
-        ec2_import.set_everything()
-
-    elif args.resource == "rds":
-        rds_import = RDSImportSetUp(region=args.region, resource=args.resource, local_repo_path=args.local_repo_path, filters=args.tag, profile=args.profile)
-        rds_import.set_everything()
-
-    elif args.resource == "eks":
-        eks_import = EKSImportSetUp(region=args.region, resource=args.resource, local_repo_path=args.local_repo_path, filters=args.tag, profile=args.profile)
-        eks_import.set_everything()
-
-    elif args.resource == "alb":
-        eks_import = ALBImportSetUp(region=args.region, resource=args.resource, local_repo_path=args.local_repo_path, filters=args.tag, profile=args.profile)
-        eks_import.set_everything()
-    elif args.resource == "s3":
-        eks_import = S3ImportSetUp(region=args.region, resource=args.resource, local_repo_path=args.local_repo_path, filters=args.tag, profile=args.profile)
-        eks_import.set_everything()
-    elif args.resource == "emr":
-        emr_import = EMRImportSetUp(region=args.region, resource=args.resource, local_repo_path=args.local_repo_path, filters=args.tag, profile=args.profile)
-        emr_import.set_everything()
-    else:
-        logger.info(f"Import Not currently supported for {args.resource}")
\ No newline at end of file
+    for arg in IMPORTER_ARGS.get(args.resource, ()):
+        if not getattr(args, arg):
+            parser.error(f"--{arg.replace('_', '-')} is required when resource is '{args.resource}'")
+
+    if args.record_cassette and args.replay_cassette:
+        parser.error("--record-cassette and --replay-cassette are mutually exclusive")
+
+    # Imported after argument parsing, pulls in boto3 and jinja2
+    from utils.import_runner import ImportRunner
+    from utils.profiling import RunProfiler
+    from utils import cassette
+    from utils.change_feed import ChangeFeed
+
+    if args.record_cassette or args.replay_cassette:
+        cassette.start(args.record_cassette or args.replay_cassette, mode="record" if args.record_cassette else "replay", latency=args.replay_latency)
+
+    profiler = RunProfiler(modes=args.profile_run or (), output_dir=args.profile_dir or f"{args.local_repo_path}/profile")
+    runner = ImportRunner.from_options(vars(args), profiler=profiler)
+
+    change_feed = None
+    resource_ids = None
+    # Render only and replayed runs import nothing, they leave the changes to the next real import
+    consume_change_feed = not args.render_only and not args.replay_cassette
+    if args.change_feed:
+        change_feed = ChangeFeed(args.change_feed, args.local_repo_path, resource=args.resource, region=args.region)
+        resource_ids = change_feed.changed_ids()
+        if not resource_ids:
+            if consume_change_feed:
+                change_feed.save_watermark()
+            sys.exit(0)
+
+    importer_args = {arg: getattr(args, arg) for arg in IMPORTER_ARGS.get(args.resource, ())}
+    importer = get_importer(args.resource)(region=args.region, resource=args.resource, local_repo_path=args.local_repo_path, filters=args.tag, profile=args.profile, runner=runner, resource_ids=resource_ids, **importer_args)
+    try:
+        importer.set_everything()
+        if change_feed is not None and consume_change_feed:
+            change_feed.save_watermark()
+    finally:
+        if cassette.active() is not None:
+            cassette.active().save()
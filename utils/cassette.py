@@ -0,0 +1,158 @@
+import base64
+import copy
+import datetime
+import gzip
+import json
+import re
+import threading
+import time
+from collections import deque
+from loguru import logger
+
+# Values of these keys are replaced in recorded requests and responses. Pagination tokens are kept, replay matches on them
+SECRET_KEY_PATTERN = re.compile(r"password|secret|sessiontoken|accesskeyid|privatekey|credentials", re.IGNORECASE)
+ACCOUNT_ID_PATTERN = re.compile(r"(?<!\d)\d{12}(?!\d)")
+REDACTED = "REDACTED"
+REDACTED_ACCOUNT_ID = "123456789012"
+
+_cassette = None
+
+
+class CassetteMiss(Exception):
+    """
+    Replay got a request the cassette holds no response for.
+    """
+
+
+class ReplayedHTTPResponse:
+    """
+    Stands in for the HTTP response of a replayed call, botocore only looks at the status code.
+    """
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+        self.content = b""
+
+
+def redact(value):
+    """
+    Copy of a request or response with secrets and AWS account IDs masked.
+    """
+    if isinstance(value, dict):
+        return {key: REDACTED if SECRET_KEY_PATTERN.search(key) and isinstance(item, str) else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        return ACCOUNT_ID_PATTERN.sub(REDACTED_ACCOUNT_ID, value)
+    return value
+
+
+def encode(value):
+    """
+    JSON friendly form of botocore values: datetimes and bytes are tagged so replay restores them.
+    """
+    if isinstance(value, dict):
+        return {key: encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, bytes):
+        return {"__bytes__": base64.b64encode(value).decode()}
+    return value
+
+
+def decode(value):
+    if isinstance(value, dict):
+        if "__datetime__" in value:
+            return datetime.datetime.fromisoformat(value["__datetime__"])
+        if "__bytes__" in value:
+            return base64.b64decode(value["__bytes__"])
+        return {key: decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    return value
+
+
+def request_key(service, operation, params):
+    return f"{service}.{operation}:{json.dumps(encode(params), sort_keys=True)}"
+
+
+class Cassette:
+    """
+    Records the botocore calls of a run into a gzip compressed, redacted JSON lines file, or replays them offline.
+    In replay mode each call is answered from the cassette after the simulated latency, in recorded order per request.
+    """
+
+    def __init__(self, path, mode, latency=0.0):
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.interactions = []
+        self.responses = {}
+        if mode == "replay":
+            with gzip.open(path, "rt") as f:
+                for line in f:
+                    interaction = json.loads(line)
+                    key = request_key(interaction["service"], interaction["operation"], interaction["params"])
+                    self.responses.setdefault(key, deque()).append(interaction)
+            logger.info(f"Replaying {sum(len(responses) for responses in self.responses.values())} recorded AWS calls from {path}")
+
+    def attach(self, client):
+        events = client.meta.events
+        events.register("before-parameter-build.*.*", self.keep_params)
+        if self.mode == "replay":
+            events.register("before-call.*.*", self.replay)
+        else:
+            events.register("after-call.*.*", self.record)
+
+    def keep_params(self, params, context, **kwargs):
+        # before-call only sees the serialized request, keep the API parameters for it
+        context["cassette_params"] = redact(copy.deepcopy(params))
+
+    def record(self, http_response, parsed, model, context, **kwargs):
+        response = {key: value for key, value in parsed.items() if key != "ResponseMetadata"}
+        interaction = {
+            "service": model.service_model.service_name,
+            "operation": model.name,
+            "params": encode(context.get("cassette_params", {})),
+            "status": http_response.status_code,
+            "response": encode(redact(response)),
+        }
+        with self.lock:
+            self.interactions.append(interaction)
+
+    def replay(self, model, context, **kwargs):
+        key = request_key(model.service_model.service_name, model.name, context.get("cassette_params", {}))
+        with self.lock:
+            responses = self.responses.get(key)
+            if not responses:
+                raise CassetteMiss(f"No recorded response for {key}")
+            # The last response of a request keeps answering when the run repeats it more often than the recording
+            interaction = responses.popleft() if len(responses) > 1 else responses[0]
+        if self.latency:
+            time.sleep(self.latency)
+        return ReplayedHTTPResponse(interaction["status"]), decode(interaction["response"])
+
+    def save(self):
+        if self.mode != "record":
+            return
+        with gzip.open(self.path, "wt") as f:
+            for interaction in self.interactions:
+                f.write(json.dumps(interaction) + "\n")
+        logger.info(f"Recorded {len(self.interactions)} AWS calls to {self.path}")
+
+
+def start(path, mode, latency=0.0):
+    """
+    Record or replay the calls of every boto3 client created from now on.
+    """
+    global _cassette
+    _cassette = Cassette(path, mode, latency)
+    return _cassette
+
+
+def active():
+    return _cassette
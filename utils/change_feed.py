@@ -0,0 +1,224 @@
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import re
+from loguru import logger
+
+WATERMARK_FILE_NAME = ".tf-import-watermark.json"
+
+# CloudTrail delivers events late and out of order across log files. Every run re-reads this window before the
+# watermark, events already read in it are recognized by their eventID
+WATERMARK_OVERLAP = datetime.timedelta(minutes=15)
+
+# CloudTrail log files are named after their delivery time, e.g. 123456789012_CloudTrail_eu-west-1_20261018T1205Z_x1y2.json.gz
+LOG_FILE_TIME_PATTERN = re.compile(r"_(\d{8}T\d{4}Z)_")
+
+
+def parse_time(value):
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def event_id(record):
+    """
+    eventID of a record, a hash of the record for stand-in records without one.
+    """
+    return record.get("eventID") or hashlib.sha256(json.dumps(record, sort_keys=True).encode()).hexdigest()
+
+
+def items(value):
+    """
+    Elements of a CloudTrail list, which come wrapped as {"items": [...]}.
+    """
+    if isinstance(value, dict):
+        value = value.get("items", [])
+    return value or []
+
+
+def name_from_arn(arn, marker):
+    """
+    Resource name following marker in an ARN, e.g. ":db:" or ":cluster/". None for other resources.
+    """
+    return arn.split(marker, 1)[1] if marker in arn else None
+
+
+def ec2_instance_ids(request, response):
+    for instance in items(response.get("instancesSet")):
+        yield instance.get("instanceId")
+    for resource in items(request.get("resourcesSet")):
+        if resource.get("resourceId", "").startswith("i-"):
+            yield resource["resourceId"]
+    yield request.get("instanceId")
+
+
+def s3_bucket_names(request, response):
+    yield request.get("bucketName")
+
+
+def rds_identifiers(request, response):
+    yield request.get("dBInstanceIdentifier")
+    yield request.get("dBClusterIdentifier")
+    resource_name = request.get("resourceName", "")
+    yield name_from_arn(resource_name, ":db:")
+    yield name_from_arn(resource_name, ":cluster:")
+
+
+def eks_cluster_names(request, response):
+    yield request.get("clusterName") or request.get("name")
+    yield name_from_arn(request.get("resourceArn", ""), ":cluster/")
+
+
+def alb_arns(request, response):
+    for load_balancer in response.get("loadBalancers") or []:
+        yield load_balancer.get("loadBalancerArn")
+    yield request.get("loadBalancerArn")
+    for resource_arn in request.get("resourceArns") or []:
+        if ":loadbalancer/" in resource_arn:
+            yield resource_arn
+
+
+def emr_cluster_ids(request, response):
+    yield response.get("jobFlowId")
+    yield request.get("jobFlowId")
+    yield request.get("clusterId")
+    yield request.get("resourceId")
+
+
+# Resource -> (event source, events creating or modifying it, extractor of the IDs its importer selects by)
+CHANGE_EVENTS = {
+    "ec2": ("ec2.amazonaws.com", {"RunInstances", "CreateTags", "DeleteTags", "ModifyInstanceAttribute", "AttachVolume", "DetachVolume"}, ec2_instance_ids),
+    "s3": (
+        "s3.amazonaws.com",
+        {
+            "CreateBucket",
+            "PutBucketTagging",
+            "PutBucketPolicy",
+            "PutBucketAcl",
+            "PutBucketVersioning",
+            "PutBucketLifecycle",
+            "PutBucketEncryption",
+            "PutBucketCors",
+            "PutBucketReplication",
+            "PutBucketIntelligentTieringConfiguration",
+            "PutBucketPublicAccessBlock",
+        },
+        s3_bucket_names,
+    ),
+    "rds": (
+        "rds.amazonaws.com",
+        {"CreateDBInstance", "ModifyDBInstance", "RestoreDBInstanceFromDBSnapshot", "CreateDBCluster", "ModifyDBCluster", "RestoreDBClusterFromSnapshot", "AddTagsToResource", "RemoveTagsFromResource"},
+        rds_identifiers,
+    ),
+    "eks": (
+        "eks.amazonaws.com",
+        {"CreateCluster", "UpdateClusterConfig", "UpdateClusterVersion", "CreateNodegroup", "UpdateNodegroupConfig", "DeleteNodegroup", "CreateAddon", "DeleteAddon", "TagResource", "UntagResource"},
+        eks_cluster_names,
+    ),
+    "alb": (
+        "elasticloadbalancing.amazonaws.com",
+        {"CreateLoadBalancer", "ModifyLoadBalancerAttributes", "SetSecurityGroups", "SetSubnets", "CreateListener", "ModifyListener", "AddTags", "RemoveTags"},
+        alb_arns,
+    ),
+    "emr": ("elasticmapreduce.amazonaws.com", {"RunJobFlow", "ModifyCluster", "AddInstanceGroups", "AddTags", "RemoveTags"}, emr_cluster_ids),
+}
+
+
+class ChangeFeed:
+    """
+    IDs of the resources created or modified since the last successful run, read from CloudTrail style event records.
+    path is a CloudTrail log file (optionally gzip compressed), a directory of them or a JSON lines file of records.
+    The watermark is the time of the newest event read. It's stored per resource and region in the workspace along with
+    the IDs of the events read in the overlap window before it, which the next run reads again.
+    """
+
+    def __init__(self, path, local_repo_path, resource, region):
+        self.path = path
+        self.resource = resource
+        self.region = region
+        self.key = f"{resource}:{region}"
+        self.watermark_path = os.path.join(local_repo_path, WATERMARK_FILE_NAME)
+        self.watermarks = {}
+        if os.path.exists(self.watermark_path):
+            with open(self.watermark_path) as f:
+                self.watermarks = json.load(f)
+        state = self.watermarks.get(self.key, {})
+        self.watermark = parse_time(state["time"]) if state else None
+        self.since = self.watermark - WATERMARK_OVERLAP if self.watermark else None
+        # eventID -> event time of the events read in the overlap window
+        self.read_events = dict(state.get("event_ids", {}))
+        self.latest = self.watermark
+
+    def log_files(self):
+        if os.path.isfile(self.path):
+            return [self.path]
+        paths = sorted(os.path.join(root, file_name) for root, _, file_names in os.walk(self.path) for file_name in file_names)
+        if self.watermark is None:
+            return paths
+
+        # Events of a log file are older than its delivery time, the minute in its name
+        def delivered_after_watermark(path):
+            match = LOG_FILE_TIME_PATTERN.search(os.path.basename(path))
+            if match is None:
+                return True
+            delivered = datetime.datetime.strptime(match.group(1), "%Y%m%dT%H%MZ").replace(tzinfo=datetime.timezone.utc)
+            return delivered + datetime.timedelta(minutes=1) > self.since
+
+        return [path for path in paths if delivered_after_watermark(path)]
+
+    def records(self, path):
+        """
+        Event records of a CloudTrail log file ({"Records": [...]}), a JSON array or a JSON lines file of one record per line.
+        """
+        open_file = gzip.open if path.endswith(".gz") else open
+        with open_file(path, "rt") as f:
+            content = f.read()
+        try:
+            document = json.loads(content)
+        except ValueError:
+            document = None
+        if isinstance(document, dict) and "Records" in document:
+            return document["Records"]
+        if isinstance(document, list):
+            return document
+        return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    def changed_ids(self):
+        """
+        IDs of the resources of this feed's resource type and region changed after the watermark.
+        """
+        event_source, event_names, extract = CHANGE_EVENTS[self.resource]
+        resource_ids = set()
+        events = 0
+        for path in self.log_files():
+            for record in self.records(path):
+                event_time = parse_time(record["eventTime"])
+                if self.since is not None and event_time <= self.since:
+                    continue
+                if record.get("awsRegion") != self.region or event_id(record) in self.read_events:
+                    continue
+                self.read_events[event_id(record)] = record["eventTime"]
+                events += 1
+                self.latest = max(self.latest, event_time) if self.latest else event_time
+                if record.get("eventSource") != event_source or record.get("eventName") not in event_names or record.get("errorCode"):
+                    continue
+                resource_ids.update(extract(record.get("requestParameters") or {}, record.get("responseElements") or {}))
+        resource_ids.discard(None)
+        logger.info(f"Read {events} new events since {self.since or 'the start of the feed'}, {len(resource_ids)} {self.resource} resources changed: {sorted(resource_ids)}")
+        return resource_ids
+
+    def save_watermark(self):
+        """
+        Store the time of the newest event read and the events read in the overlap window before it.
+        """
+        if self.latest is None:
+            return
+        since = self.latest - WATERMARK_OVERLAP
+        self.watermarks[self.key] = {
+            "time": self.latest.isoformat().replace("+00:00", "Z"),
+            "event_ids": {read_event: event_time for read_event, event_time in self.read_events.items() if parse_time(event_time) > since},
+        }
+        with open(f"{self.watermark_path}.tmp", "w") as f:
+            json.dump(self.watermarks, f, indent=2)
+        os.replace(f"{self.watermark_path}.tmp", self.watermark_path)
+        logger.info(f"Saved the {self.key} change feed watermark {self.watermarks[self.key]['time']} to {self.watermark_path}")
@@ -43,6 +43,21 @@ RESOURCE_CLEANUP = {
     "aws_emr_cluster": ["subnet_id "]
 }
 
+# Value rules of RESOURCE_CLEANUP, replaced by strip_defaults for resource types in the provider schema
+SCHEMA_COVERED_PATTERNS = ("= 0", "= \[\]")
+
+# Null sensitive values of kerboreos auth in EMR cluster are kept, to be filled in by hand
+KEEP_NULL_ATTRIBUTES = ["ad_domain_join_password", "ad_domain_join_user", "cross_realm_trust_principal_password", "kdc_admin_password"]
+
+# Single line values dropped per attribute kind, leaving these out of the config plans no change
+EMPTY_VALUES = {"null", "[]", "{}"}
+ZERO_VALUES = EMPTY_VALUES | {"0", "false", '""'}
+
+ATTRIBUTE_PATTERN = re.compile(r"\s*(\w+)\s*=\s*(.*?)\s*$")
+NESTED_BLOCK_PATTERN = re.compile(r"\s*(\w+)\s*\{\s*$")
+HEREDOC_PATTERN = re.compile(r"<<-?(\w+)\s*$")
+STRING_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"')
+
 
 def remove_global_lines(tf_file, list_to_cleanup):
     output_file = tf_file  # f"{tf_file}-global-cleanup.tf"
@@ -60,7 +75,7 @@ def remove_global_lines(tf_file, list_to_cleanup):
                     filtered_lines.append(line)
 
                 # Handle null sensitive value for kerboreos auth in EMR cluster
-                if any(keyword in line for keyword in ["ad_domain_join_password", "ad_domain_join_user", "cross_realm_trust_principal_password", "kdc_admin_password"]):
+                if any(keyword in line for keyword in KEEP_NULL_ATTRIBUTES):
                     filtered_lines.append(line)
                 continue
 
@@ -103,7 +118,89 @@ def should_remove_line(line, resource_type, custom_pattern=[]):
     return False
 
 
-def process_terraform_plan(input_file):
+def bracket_depth(text):
+    """
+    Brackets opened minus brackets closed in a line, string literals aside.
+    """
+    text = STRING_PATTERN.sub('""', text)
+    return sum(text.count(bracket) for bracket in "{[(") - sum(text.count(bracket) for bracket in "}])")
+
+
+def is_default(kind, value):
+    if kind == "computed":
+        return True
+    if kind == "optional_computed":
+        return value in ZERO_VALUES
+    if kind == "optional":
+        return value in EMPTY_VALUES
+    return False
+
+
+def strip_defaults(input_file, schema):
+    """
+    Remove attributes that plan no change when left out, by their kind in the provider schema:
+    computed only attributes, empty or zero values of optional computed attributes and null or empty optional attributes.
+    Multi line values are left alone. Resource types unknown to the schema get the global pattern rules.
+    """
+    with open(input_file, "r") as readfile:
+        lines = readfile.readlines()
+
+    new_lines = []
+    blocks = []  # schema index per open block, None inside resource types or blocks the schema doesn't know
+    known_type = False
+    value_depth = 0
+    heredoc_end = None
+    removed = 0
+
+    for line in lines:
+        if heredoc_end is not None:
+            heredoc_end = None if line.strip() == heredoc_end else heredoc_end
+            new_lines.append(line)
+            continue
+        if value_depth:
+            value_depth += bracket_depth(line)
+            new_lines.append(line)
+            continue
+
+        resource_block_match = re.match(r'\s*resource\s+"(\w+)"\s+"[^"]+"\s+{', line)
+        if resource_block_match:
+            blocks = [schema.get(resource_block_match.group(1))]
+            known_type = blocks[0] is not None
+            new_lines.append(line)
+            continue
+        if not blocks:
+            new_lines.append(line)
+            continue
+
+        block = blocks[-1]
+        nested_block_match = NESTED_BLOCK_PATTERN.match(line)
+        attribute_match = ATTRIBUTE_PATTERN.match(line)
+        if nested_block_match:
+            blocks.append(block["blocks"].get(nested_block_match.group(1)) if block else None)
+        elif line.strip() == "}":
+            blocks.pop()
+        elif attribute_match:
+            name, value = attribute_match.groups()
+            heredoc_match = HEREDOC_PATTERN.search(value)
+            if heredoc_match:
+                heredoc_end = heredoc_match.group(1)
+            elif bracket_depth(value) > 0:
+                value_depth = bracket_depth(value)
+            elif block is None:
+                if not known_type and any(element in line for element in RESOURCE_CLEANUP["global"]) and name not in KEEP_NULL_ATTRIBUTES:
+                    removed += 1
+                    continue
+            elif is_default(block["attributes"].get(name), value) and name not in KEEP_NULL_ATTRIBUTES:
+                removed += 1
+                continue
+        new_lines.append(line)
+
+    with open(input_file, "w") as new_file:
+        new_file.writelines(new_lines)
+    logger.info(f"Removed {removed} default valued attributes from {input_file}")
+
+
+def process_terraform_plan(input_file, schema=None):
     with open(input_file, "r") as file:
         lines = file.readlines()
 
@@ -147,7 +244,12 @@ def process_terraform_plan(input_file):
             if current_resource_type == "aws_db_option_group": #Special Case for Jsonencode Skipping decimal in version number fix
                 if "jsonencode(8)" in line:
                     line = 'major_engine_version      = "8.0"\n'
-            if should_remove_line(line, current_resource_type):
+            if schema is not None and schema.get(current_resource_type) is not None:
+                # Values are cleaned up by strip_defaults, only the rules for conflicting attributes are left
+                patterns = [pattern for pattern in RESOURCE_CLEANUP.get(current_resource_type, []) if pattern not in SCHEMA_COVERED_PATTERNS]
+                if patterns and should_remove_line(line, current_resource_type, patterns):
+                    continue
+            elif should_remove_line(line, current_resource_type):
                 continue
         new_lines.append(line)
 
@@ -159,11 +261,15 @@ def process_terraform_plan(input_file):
     logger.info(f"Generated Cleaned up File: {input_file}")
 
 
-def cleanup_tf_plan_file(input_tf_file):
+def cleanup_tf_plan_file(input_tf_file, schema=None):
 
-    # Process the Global defaults vaules
-    level1_cleanup_file = remove_global_lines(input_tf_file, RESOURCE_CLEANUP["global"])
+    # Process the Global defaults vaules, from the provider schema when there is one
+    if schema is None:
+        level1_cleanup_file = remove_global_lines(input_tf_file, RESOURCE_CLEANUP["global"])
+    else:
+        strip_defaults(input_tf_file, schema)
+        level1_cleanup_file = input_tf_file
 
     # Process resource Specific Blocks
-    process_terraform_plan(level1_cleanup_file)
+    process_terraform_plan(level1_cleanup_file, schema)
     remove_multiline(input_tf_file, RESOURCE_CLEANUP["multiline_pattern"])
\ No newline at end of file
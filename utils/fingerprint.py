@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+from loguru import logger
+import utils.cleanup
+
+FINGERPRINT_FILE_NAME = ".tf-import-fingerprints.json"
+
+_source_hashes = {}
+
+
+def hash_file(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def source_hash(path):
+    """
+    Hash of a template or module source, computed once per process.
+    """
+    if path not in _source_hashes:
+        _source_hashes[path] = hash_file(path)
+    return _source_hashes[path]
+
+
+def input_fingerprint(template, context, sources=()):
+    """
+    Fingerprint of everything that goes into the generated code of a resource:
+    the template context, the template source, the cleanup rules and any other source given.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr(sorted(context.items())).encode())
+    digest.update(source_hash(template.filename).encode())
+    digest.update(source_hash(utils.cleanup.__file__).encode())
+    for source in sources:
+        digest.update(source_hash(source).encode())
+    return digest.hexdigest()
+
+
+class FingerprintStore:
+    """
+    Fingerprints of the resources imported by earlier runs, keyed by import file name.
+    Stored in the workspace next to the generated files.
+    """
+
+    def __init__(self, local_repo_path):
+        self.path = os.path.join(local_repo_path, FINGERPRINT_FILE_NAME)
+        self.fingerprints = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.fingerprints = json.load(f)
+
+    def is_unchanged(self, name, fingerprint):
+        """
+        True when the resource was imported with the same fingerprint and its generated files are untouched since.
+        """
+        entry = self.fingerprints.get(name)
+        if entry is None or entry["input"] != fingerprint:
+            return False
+        workspace = os.path.dirname(self.path)
+        for generated_file, output_hash in entry["output"].items():
+            path = os.path.join(workspace, generated_file)
+            if not os.path.exists(path) or hash_file(path) != output_hash:
+                return False
+        return True
+
+    def generated_files(self, name):
+        entry = self.fingerprints.get(name)
+        return list(entry["output"]) if entry else []
+
+    def record(self, name, fingerprint, generated_files):
+        workspace = os.path.dirname(self.path)
+        self.fingerprints[name] = {"input": fingerprint, "output": {generated_file: hash_file(os.path.join(workspace, generated_file)) for generated_file in generated_files}}
+
+    def rehash(self, generated_files):
+        """
+        Update the recorded hashes of generated files rewritten after their import.
+        """
+        workspace = os.path.dirname(self.path)
+        generated_files = set(generated_files)
+        for entry in self.fingerprints.values():
+            for generated_file in generated_files.intersection(entry["output"]):
+                entry["output"][generated_file] = hash_file(os.path.join(workspace, generated_file))
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.fingerprints, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved {len(self.fingerprints)} resource fingerprints to {self.path}")
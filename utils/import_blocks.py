@@ -0,0 +1,123 @@
+# Import block emitters, the plain Python counterpart of templates/*_import.tf.j2 for .tf.json import files.
+# Each emitter takes the template context of its importer and yields (address, import ID) pairs.
+
+
+def ec2_import_blocks(context):
+    instance = context["instance_details"]
+    # Instances without a Name tag are addressed by their ID, like in the template
+    name = (instance.instance_name or instance.instance_id).replace(" ", "-").lower()
+    yield f"aws_instance.{name}", instance.instance_id
+
+    for volume in instance.volumes:
+        if volume.attachment_type == "data":
+            yield f"aws_ebs_volume.{volume.volume_id}", volume.volume_id
+            yield f"aws_volume_attachment.{volume.volume_id}", f"{volume.device}:{volume.volume_id}:{instance.instance_id}"
+
+    if context["dns_record_name"] != "":
+        yield f"aws_route53_record.{name}", f"{context['zone_id']}_{context['dns_record_name']}_A"
+
+
+def rds_import_blocks(context):
+    if context["is_cluster"] == "true":
+        identifier = context["rds_cluster_identifier"]
+        yield f"aws_rds_cluster.{identifier}", identifier
+
+        if "default." not in context["cluster_parameter"]:
+            yield f"aws_rds_cluster_parameter_group.{identifier}", context["cluster_parameter"]
+        if context["kms_key_id"] != "":
+            yield f"aws_kms_key.{identifier}", context["kms_key_id"]
+
+        for db_instance in context["cluster_instances"]:
+            member = db_instance.instance_identifier
+            member_type = "aws_rds_cluster_instance" if context["is_aurora"] == "true" else "aws_db_instance"
+            yield f"{member_type}.{member}", member
+
+            for db_parameter_group in db_instance.db_parameter_group:
+                if "default." not in db_parameter_group:
+                    yield f"aws_db_parameter_group.{member}_{db_parameter_group}", db_parameter_group
+            for option_group in db_instance.option_groups:
+                if "default:" not in option_group:
+                    yield f"aws_db_option_group.{member}_{option_group}", option_group
+
+    if context["is_aurora"] == "false" and context["is_cluster"] == "false":
+        identifier = context["instance_identifier"]
+        yield f"aws_db_instance.{identifier}", identifier
+
+        if context["kms_key_id"] != "":
+            yield f"aws_kms_key.{identifier}", context["kms_key_id"]
+        for index, option_group in enumerate(context["option_groups"], start=1):
+            if "default:" not in option_group:
+                yield f"aws_db_option_group.{identifier}_instance_{index}_{option_group}", option_group
+        for index, db_param_group in enumerate(context["db_parameter_groups"], start=1):
+            if "default." not in db_param_group:
+                yield f"aws_db_parameter_group.{identifier}_{index}_{db_param_group}", db_param_group
+
+
+def eks_import_blocks(context):
+    cluster_name = context["cluster_name"]
+    yield f"aws_eks_cluster.{cluster_name}", cluster_name
+
+    for add_on in context["eks_add_ons"]:
+        yield f"aws_eks_addon.{cluster_name}-{add_on}", f"{cluster_name}:{add_on}"
+
+    for node_group in context["node_groups"]:
+        yield f"aws_eks_node_group.{cluster_name}-{node_group.name}", f"{cluster_name}:{node_group.name}"
+        if node_group.launch_template != "":
+            yield f"aws_launch_template.{cluster_name}-{node_group.launch_template}", node_group.launch_template
+        for asg_name in node_group.asg_names:
+            yield f"aws_autoscaling_group.{cluster_name}-{node_group.name}-{asg_name}", asg_name
+
+    for external_asg in context["manage_external_asgs"]:
+        yield f"aws_launch_template.{cluster_name}-{external_asg.launch_template}", external_asg.launch_template
+        yield f"aws_autoscaling_group.{cluster_name}-{external_asg.asg_name}", external_asg.asg_name
+
+
+def alb_import_blocks(context):
+    load_balancer_name = context["load_balancer_name"]
+    yield f"aws_lb.{load_balancer_name}", context["load_balancer_arn"]
+
+    # aws_lb_listener isn't imported, https://github.com/hashicorp/terraform-provider-aws/issues/37211
+    imported_target_groups = set()
+    for listener in context["load_balancer_listeners"]:
+        for target_group in listener.target_groups:
+            target_group_key = target_group.split("/")[-2]
+            if target_group_key not in imported_target_groups:
+                yield f"aws_lb_target_group.{target_group_key}-{listener.listener_port}", target_group
+                imported_target_groups.add(target_group_key)
+
+    if context["s3_bucket"] != "":
+        yield f"aws_s3_bucket.{load_balancer_name}-{context['s3_bucket']}", context["s3_bucket"]
+
+
+def s3_import_blocks(context):
+    bucket_name = context["bucket_name"]
+    yield f"aws_s3_bucket.{bucket_name}", bucket_name
+    yield f"aws_s3_bucket_public_access_block.{bucket_name}", bucket_name
+
+    for flag, resource_type in (
+        ("bucket_acl", "aws_s3_bucket_acl"),
+        ("bucket_policy", "aws_s3_bucket_policy"),
+        ("bucket_lifecycle_rule", "aws_s3_bucket_lifecycle_configuration"),
+        ("bucket_intelligent_tiering", "aws_s3_bucket_intelligent_tiering_configuration"),
+        ("bucket_cors_config", "aws_s3_bucket_cors_configuration"),
+        ("bucket_versioning", "aws_s3_bucket_versioning"),
+        ("bucket_replication_config", "aws_s3_bucket_replication_configuration"),
+        ("bucket_server_side_encryption", "aws_s3_bucket_server_side_encryption_configuration"),
+    ):
+        if context[flag]:
+            yield f"{resource_type}.{bucket_name}", bucket_name
+
+
+def emr_import_blocks(context):
+    yield f"aws_emr_cluster.{context['cluster_name']}", context["cluster_id"]
+
+
+# Emitter per import template
+IMPORT_BLOCK_EMITTERS = {
+    "ec2_import.tf.j2": ec2_import_blocks,
+    "rds_import.tf.j2": rds_import_blocks,
+    "eks_import.tf.j2": eks_import_blocks,
+    "alb_import.tf.j2": alb_import_blocks,
+    "s3_import.tf.j2": s3_import_blocks,
+    "emr_import.tf.j2": emr_import_blocks,
+}
@@ -0,0 +1,116 @@
+import glob
+import json
+import os
+import re
+from loguru import logger
+from utils.state_index import StateIndex
+
+# Matches an uncommented import block in a rendered template and captures the (address, id) pair
+IMPORT_BLOCK_PATTERN = re.compile(r'^[ \t]*import\s*\{\s*\n\s*to\s*=\s*(\S+)\s*\n\s*id\s*=\s*"([^"]*)"\s*\n\s*\}[ \t]*\n?', re.MULTILINE)
+
+
+class ImportIndex:
+    """
+    Run wide index of import blocks keyed by (terraform type, import ID).
+    Shared dependencies like Security Groups, KMS keys, Parameter Groups or Launch Templates are imported once,
+    later resources referencing them get the address already in the index.
+    Resources already managed in the terraform state are looked up in the state index.
+    """
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_address = {}
+        self.by_file = {}
+        self.state = StateIndex()
+
+    def add(self, address, import_id, file_name):
+        self.by_id[(address.split(".")[0], import_id)] = address
+        self.by_address[address] = import_id
+        self.by_file.setdefault(file_name, []).append((address, import_id))
+
+    def forget(self, file_name):
+        """
+        Remove the import blocks of a file that is about to be rewritten.
+        """
+        for address, import_id in self.by_file.pop(file_name, []):
+            self.by_id.pop((address.split(".")[0], import_id), None)
+            self.by_address.pop(address, None)
+
+    def lookup(self, address, import_id):
+        """
+        Address already importing or managing this resource, None if there is none.
+        """
+        existing = self.by_id.get((address.split(".")[0], import_id))
+        if existing is None:
+            existing = self.state.lookup(address, import_id)
+        return existing
+
+    def taken(self, address):
+        """
+        Whether an import block or a resource in the terraform state already uses the address.
+        """
+        return address in self.by_address or address in self.state.addresses
+
+    def load_workspace(self, local_repo_path):
+        """
+        Index import blocks left in the workspace by earlier runs.
+        """
+        for path in glob.glob(os.path.join(local_repo_path, "import-*.tf")) + glob.glob(os.path.join(local_repo_path, "import-*.tf.imported")):
+            file_name = os.path.basename(path).removesuffix(".imported")
+            with open(path) as f:
+                for address, import_id in IMPORT_BLOCK_PATTERN.findall(f.read()):
+                    self.add(address, import_id, file_name)
+        for path in glob.glob(os.path.join(local_repo_path, "import-*.tf.json")) + glob.glob(os.path.join(local_repo_path, "import-*.tf.json.imported")):
+            file_name = os.path.basename(path).removesuffix(".imported")
+            with open(path) as f:
+                for import_block in json.load(f).get("import", []):
+                    self.add(import_block["to"], import_block["id"], file_name)
+        logger.info(f"Indexed {len(self.by_id)} existing import blocks in {local_repo_path}")
+
+    def dedupe(self, rendered_template, file_name):
+        """
+        Drop import blocks already in the index from a rendered template and index the remaining ones.
+        Returns the template and the (address, id) pairs kept.
+        """
+        kept = []
+        self.forget(file_name)
+
+        def keep_or_drop(match):
+            address, import_id = match.groups()
+            kept_address = self.keep(address, import_id, file_name)
+            if kept_address is None:
+                return ""
+            kept.append((kept_address, import_id))
+            return match.group(0).replace(address, kept_address, 1)
+
+        return IMPORT_BLOCK_PATTERN.sub(keep_or_drop, rendered_template), kept
+
+    def dedupe_blocks(self, import_blocks, file_name):
+        """
+        Same as dedupe for emitted (address, id) pairs. Returns the pairs kept.
+        """
+        self.forget(file_name)
+        kept = []
+        for address, import_id in import_blocks:
+            kept_address = self.keep(address, import_id, file_name)
+            if kept_address is not None:
+                kept.append((kept_address, import_id))
+        return kept
+
+    def keep(self, address, import_id, file_name):
+        """
+        Index an import block unless the same resource is already in the index. Returns the address it's indexed at,
+        None when it's dropped. A different resource at a taken address gets the address with a numeric suffix.
+        """
+        existing = self.lookup(address, import_id)
+        if existing is not None:
+            logger.info(f"Skipping import of {address} ({import_id}), already imported as {existing}")
+            return None
+        if self.taken(address):
+            suffix = 2
+            while self.taken(f"{address}_{suffix}"):
+                suffix += 1
+            logger.error(f"Address {address} of {import_id} is already used by another resource, importing it as {address}_{suffix}")
+            address = f"{address}_{suffix}"
+        self.add(address, import_id, file_name)
+        return address
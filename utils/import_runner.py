@@ -0,0 +1,503 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from loguru import logger
+from utils.utilities import Utilities, SkipTag
+from utils.cleanup import cleanup_tf_plan_file
+from utils.import_index import ImportIndex
+from utils.fingerprint import FingerprintStore, input_fingerprint
+from utils.plan_summary import summarize_plan
+from utils.provider_schema import load_provider_schema
+import utils.provider_schema
+from utils.profiling import RunProfiler
+from utils.tagging import tag_resources
+import utils.import_blocks
+from utils.import_blocks import IMPORT_BLOCK_EMITTERS
+from utils.references import build_reference_index, link_references, resource_blocks
+from utils.shards import DEFAULT_SHARD_SIZE_KB, SHARD_MANIFEST_FILE_NAME, ShardedOutput
+
+MANIFEST_FILE_NAME = "import-manifest.json"
+TAG_FAILURES_FILE_NAME = "tag-failures.json"
+PLAN_SUMMARY_FILE_NAME = "plan-summary.json"
+
+# Files per terraform fmt call, keeps the command line short
+FMT_BATCH_SIZE = 100
+QUARANTINE_DIR_NAME = "quarantine"
+CHUNK_GENERATED_FILE_NAME = "generated-plan-import-chunk.tf"
+
+# Chunked plan mode resizes chunks so one plan takes roughly this long
+PLAN_CHUNK_TARGET_SECONDS = 120
+MAX_PLAN_CHUNK_SIZE = 200
+
+# Workspaces terraform init already ran for in this process
+INITIALIZED_WORKSPACES = set()
+
+# ImportRunner options and their defaults, named like the command line flags and the daemon job keys
+RUNNER_OPTIONS = {
+    "profile": "default",
+    "render_only": False,
+    "plan_chunk_size": None,
+    "skip_unchanged": False,
+    "tag_imported": False,
+    "link_references": False,
+    "import_format": "hcl",
+    "plan_workers": 1,
+    "output_layout": "per-resource",
+    "shard_size_kb": DEFAULT_SHARD_SIZE_KB,
+}
+
+
+@dataclass(slots=True)
+class PendingImport:
+    path: str
+    name: str
+    generated_name: str
+    fingerprint: str
+    entries: list
+    arn: str = ""
+
+    @property
+    def addresses(self):
+        return [entry["address"] for entry in self.entries]
+
+    @property
+    def generated_file(self):
+        return f"generated-plan-import-{self.generated_name}.tf"
+
+
+class ImportRunner:
+    """
+    Terraform side of an Import: write import blocks, generate config, cleanup, format and plan.
+    Shared by every Resource ImportSetUp class.
+    """
+
+    def __init__(
+        self,
+        local_repo_path,
+        region,
+        profile,
+        render_only=False,
+        plan_chunk_size=None,
+        skip_unchanged=False,
+        profiler=None,
+        tag_imported=False,
+        link_references=False,
+        import_format="hcl",
+        plan_workers=1,
+        output_layout="per-resource",
+        shard_size_kb=DEFAULT_SHARD_SIZE_KB,
+    ):
+        self.local_repo_path = local_repo_path
+        self.region = region
+        self.aws_profile = profile
+        self.render_only = render_only
+        self.plan_chunk_size = plan_chunk_size
+        self.skip_unchanged = skip_unchanged
+        self.tag_imported = tag_imported
+        self.link_references = link_references
+        self.import_format = import_format
+        self.plan_workers = plan_workers
+        self.output_layout = output_layout
+        self.shard_size_kb = shard_size_kb
+        self.sharded_output = None
+        # (ARN, addresses) of the resources planned in this run
+        self.imported_arns = []
+        # Final plan result per address, empty until verify_imports wrote plan-summary.json
+        self.plan_summary = {}
+        self.imported_addresses = []
+        self.manifest = []
+        self.pending = []
+        self.quarantined = []
+        self.generated_files = []
+        self.import_index = ImportIndex()
+        self.fingerprints = None
+        self.provider_schema = None
+        self.profiler = profiler or RunProfiler()
+
+    @classmethod
+    def from_options(cls, options, profiler=None):
+        """
+        Runner for parsed command line arguments (as vars(args)) or a daemon job request, missing or null options get their defaults.
+        """
+        kwargs = {option: default if options.get(option) is None else options[option] for option, default in RUNNER_OPTIONS.items()}
+        return cls(local_repo_path=options["local_repo_path"], region=options["region"], profiler=profiler, **kwargs)
+
+    def terraform(self, *args, log_output=True):
+        return Utilities.run_terraform_cmd(["terraform", f"-chdir={self.local_repo_path}", *args], profile=self.aws_profile, log_output=log_output)
+
+    def init_workspace(self):
+        """
+        Generate Terraform provider, run terraform init and index the resources already in the state.
+        No terraform call in render only mode, the local state file is read instead.
+        """
+        Utilities.generate_tf_provider(self.local_repo_path, region=self.region)
+        self.import_index.load_workspace(self.local_repo_path)
+        self.fingerprints = FingerprintStore(self.local_repo_path)
+        if self.render_only:
+            self.import_index.state.load_state_file(self.local_repo_path)
+            return
+        if self.output_layout == "sharded":
+            self.sharded_output = ShardedOutput(self.local_repo_path, self.shard_size_kb * 1024)
+
+        workspace = os.path.realpath(self.local_repo_path)
+        if workspace not in INITIALIZED_WORKSPACES:
+            _, _, returncode = self.terraform("init")
+            # A failed init, e.g. a provider download, is retried by the next run of the workspace
+            if returncode == 0:
+                INITIALIZED_WORKSPACES.add(workspace)
+        self.provider_schema = load_provider_schema(self.local_repo_path, self.terraform)
+        stdout, stderr, returncode = self.terraform("show", "-json", log_output=False)
+        if returncode != 0:
+            logger.warning(f"Couldn't read the terraform state, already managed resources won't be skipped: {stderr}")
+            return
+        self.import_index.state.load_show_json(stdout)
+
+    def is_managed(self, resource_type, import_id):
+        """
+        True when terraform already manages the resource, it's skipped before rendering.
+        """
+        address = self.import_index.state.by_id.get((resource_type, import_id))
+        if address is None:
+            return False
+        logger.info(f"Skipping {resource_type} {import_id}, already managed as {address}")
+        return True
+
+    def import_resource(self, name, template, context, generated_name=None, arn=None):
+        """
+        Render and write the import blocks for one resource, Generate Terraform code, Cleanup Terraform code
+        """
+        generated_name = generated_name or name
+        import_file_name = f"import-{name}.tf.json" if self.import_format == "json" else f"import-{name}.tf"
+        output_file_path = f"{self.local_repo_path}/{import_file_name}"
+
+        sources = (utils.import_blocks.__file__,) if self.import_format == "json" else ()
+        if self.provider_schema is not None and self.provider_schema.path:
+            # Cleanup output depends on the provider version the schema index was built for
+            sources += (utils.provider_schema.__file__, self.provider_schema.path)
+        fingerprint = input_fingerprint(template, context, sources=sources)
+        if self.skip_unchanged and not self.render_only and self.fingerprints.is_unchanged(name, fingerprint):
+            logger.info(f"Skipping {name}, unchanged since it was last imported")
+            return
+
+        # Shared dependencies already imported in this run or workspace are not imported again
+        with self.profiler.phase("render"):
+            if self.import_format == "json":
+                import_blocks = self.import_index.dedupe_blocks(IMPORT_BLOCK_EMITTERS[template.name](context), import_file_name)
+            else:
+                rendered_template, import_blocks = self.import_index.dedupe(template.render(context), import_file_name)
+            if not import_blocks:
+                logger.info(f"Nothing left to import for {name}, all resources are already imported")
+                return
+
+            with open(output_file_path, "w") as f:
+                if self.import_format == "json":
+                    json.dump({"import": [{"to": address, "id": import_id} for address, import_id in import_blocks]}, f, indent=2)
+                else:
+                    f.write(rendered_template)
+
+        entries = [{"address": address, "id": import_id, "file": import_file_name} for address, import_id in import_blocks]
+        self.manifest.extend(entries)
+
+        if self.render_only:
+            return
+
+        pending = PendingImport(path=output_file_path, name=name, generated_name=generated_name, fingerprint=fingerprint, entries=entries, arn=arn or "")
+        self.set_aside_previous_output(pending)
+
+        if self.plan_chunk_size:
+            self.pending.append(pending)
+            if len(self.pending) >= self.plan_chunk_size:
+                self.plan_pending()
+            return
+
+        with self.profiler.phase("plan"):
+            self.terraform("plan", f"-generate-config-out={pending.generated_file}")
+        os.rename(output_file_path, f"{output_file_path}.imported")
+        self.finish_import(pending)
+
+    def set_aside_previous_output(self, pending):
+        """
+        Move config generated for this resource by an earlier run out of the way, terraform won't overwrite it.
+        """
+        for generated_file in self.fingerprints.generated_files(pending.name):
+            path = os.path.join(self.local_repo_path, generated_file)
+            if os.path.exists(path):
+                os.replace(path, f"{path}.previous")
+                logger.info(f"Moved previously generated {path} to {path}.previous")
+
+    def finish_import(self, pending):
+        """
+        Cleanup the Generated Terraform code of a planned resource and record its fingerprint.
+        """
+        generated_path = os.path.join(self.local_repo_path, pending.generated_file)
+        if not os.path.exists(generated_path):
+            return
+        with self.profiler.phase("cleanup"):
+            cleanup_tf_plan_file(input_tf_file=generated_path, schema=self.provider_schema)
+        if self.sharded_output is not None:
+            # Already imported resources in the shards are skipped by the import index, there is no generated file to track
+            self.shard_import(pending)
+            self.fingerprints.record(pending.name, pending.fingerprint, [])
+        else:
+            self.generated_files.append(pending.generated_file)
+            self.fingerprints.record(pending.name, pending.fingerprint, [pending.generated_file])
+        self.imported_addresses.extend(pending.addresses)
+        if pending.arn:
+            self.imported_arns.append((pending.arn, pending.addresses))
+
+    def shard_import(self, pending):
+        """
+        Move the import blocks and the generated config of a planned resource into the shards of their resource types.
+        """
+        generated_path = os.path.join(self.local_repo_path, pending.generated_file)
+        with open(generated_path) as f:
+            content = f.read()
+        for address, start, _, end in resource_blocks(content):
+            self.sharded_output.add("generated", address.split(".")[0], content[start:end])
+        os.remove(generated_path)
+
+        for entry in pending.entries:
+            resource_type = entry["address"].split(".")[0]
+            if self.import_format == "json":
+                entry["file"] = self.sharded_output.add("import", resource_type, {"to": entry["address"], "id": entry["id"]}, extension=".tf.json")
+            else:
+                entry["file"] = self.sharded_output.add("import", resource_type, f'import {{\n  to = {entry["address"]}\n  id = "{entry["id"]}"\n}}\n\n')
+        os.remove(f"{pending.path}.imported")
+
+    def split_generated_config(self, chunk):
+        """
+        Split the config generated for a chunk into one generated file per resource, like per resource plans produce.
+        """
+        chunk_path = os.path.join(self.local_repo_path, CHUNK_GENERATED_FILE_NAME)
+        if not os.path.exists(chunk_path):
+            return
+        with open(chunk_path) as f:
+            content = f.read()
+        owners = {address: pending for pending in chunk for address in pending.addresses}
+
+        # The "# __generated__ by Terraform" comment lines right above a resource block go with it
+        blocks = {}
+        for address, start, _, end in resource_blocks(content):
+            owner = owners.get(address, chunk[0])
+            blocks.setdefault(owner.generated_file, []).append(content[start:end])
+
+        for generated_file, owned_blocks in blocks.items():
+            with open(os.path.join(self.local_repo_path, generated_file), "w") as f:
+                f.write("".join(owned_blocks))
+        os.remove(chunk_path)
+
+    def plan_chunk(self, chunk):
+        """
+        Generate Terraform code for a chunk of import files in a single plan.
+        Returns the error text, None when the plan succeeded.
+        """
+        chunk_path = os.path.join(self.local_repo_path, CHUNK_GENERATED_FILE_NAME)
+        for pending in chunk:
+            os.rename(f"{pending.path}.pending", pending.path)
+
+        start = time.monotonic()
+        with self.profiler.phase("plan"):
+            stdout, stderr, returncode = self.terraform("plan", f"-generate-config-out={CHUNK_GENERATED_FILE_NAME}")
+        elapsed = time.monotonic() - start
+
+        if returncode != 0:
+            for pending in chunk:
+                os.rename(pending.path, f"{pending.path}.pending")
+            if os.path.exists(chunk_path):
+                os.remove(chunk_path)
+            return stderr or stdout
+
+        for pending in chunk:
+            os.rename(pending.path, f"{pending.path}.imported")
+        self.split_generated_config(chunk)
+        for pending in chunk:
+            self.finish_import(pending)
+
+        # Resize next chunks from the observed plan time per resource, halfway between current and ideal size
+        ideal_size = int(PLAN_CHUNK_TARGET_SECONDS / max(elapsed / len(chunk), 0.001))
+        self.plan_chunk_size = max(1, min(MAX_PLAN_CHUNK_SIZE, (self.plan_chunk_size + ideal_size) // 2))
+        logger.info(f"Planned chunk of {len(chunk)} resources in {elapsed:.1f}s, next chunk size: {self.plan_chunk_size}")
+        return None
+
+    def quarantine(self, pending, error):
+        """
+        Move an import file terraform can't plan out of the workspace along with the error text.
+        """
+        quarantine_dir = os.path.join(self.local_repo_path, QUARANTINE_DIR_NAME)
+        os.makedirs(quarantine_dir, exist_ok=True)
+        quarantine_path = os.path.join(quarantine_dir, os.path.basename(pending.path))
+        os.rename(f"{pending.path}.pending", quarantine_path)
+        with open(f"{quarantine_path}.error", "w") as f:
+            f.write(error)
+        self.quarantined.append(quarantine_path)
+        self.import_index.forget(os.path.basename(pending.path))
+        logger.error(f"Quarantined {quarantine_path}, terraform plan failed: {error}")
+
+    def plan_pending(self):
+        """
+        Plan the pending import files chunk wise. A failing chunk is bisected until the failing resources are isolated and quarantined.
+        """
+        if not self.pending:
+            return
+        for pending in self.pending:
+            os.rename(pending.path, f"{pending.path}.pending")
+
+        chunks = [self.pending]
+        self.pending = []
+        while chunks:
+            chunk = chunks.pop()
+            error = self.plan_chunk(chunk)
+            if error is None:
+                continue
+            if len(chunk) == 1:
+                self.quarantine(chunk[0], error)
+                continue
+            middle = len(chunk) // 2
+            chunks.append(chunk[middle:])
+            chunks.append(chunk[:middle])
+
+    def restore_import_files(self):
+        """
+        Rename the import files parked during the per resource plans back to .tf
+        """
+        for filename in os.listdir(self.local_repo_path):
+            if filename.endswith(".imported"):
+                new_filename = filename.replace(".imported", "")
+                old_file = os.path.join(self.local_repo_path, filename)
+                new_file = os.path.join(self.local_repo_path, new_filename)
+                os.rename(old_file, new_file)
+
+    def output_files(self):
+        """
+        Files written into the workspace by this run, relative to local_repo_path.
+        """
+        import_files = dict.fromkeys(entry["file"] for entry in self.manifest)
+        for quarantine_path in self.quarantined:
+            import_files.pop(os.path.basename(quarantine_path), None)
+        quarantined = [os.path.relpath(path, self.local_repo_path) for path in self.quarantined]
+        manifest = [MANIFEST_FILE_NAME] if os.path.exists(os.path.join(self.local_repo_path, MANIFEST_FILE_NAME)) and self.render_only else []
+        shard_manifest = [SHARD_MANIFEST_FILE_NAME] if self.sharded_output is not None and os.path.exists(os.path.join(self.local_repo_path, SHARD_MANIFEST_FILE_NAME)) else []
+        plan_summary = [PLAN_SUMMARY_FILE_NAME] if self.plan_summary else []
+        return list(import_files) + self.generated_files + quarantined + manifest + shard_manifest + plan_summary
+
+    def format_files(self):
+        """
+        terraform fmt the HCL files written by this run only, in batches, instead of the whole workspace.
+        """
+        quarantined = {os.path.basename(path) for path in self.quarantined}
+        import_files = [file_name for file_name in dict.fromkeys(entry["file"] for entry in self.manifest) if file_name.endswith(".tf") and file_name not in quarantined]
+        files = [file_name for file_name in import_files + self.generated_files if os.path.exists(os.path.join(self.local_repo_path, file_name))]
+        for start in range(0, len(files), FMT_BATCH_SIZE):
+            self.terraform("fmt", *files[start : start + FMT_BATCH_SIZE])
+        # Formatting rewrites generated files after their fingerprint was recorded
+        self.fingerprints.rehash(self.generated_files)
+
+    def write_manifest(self):
+        manifest_path = os.path.join(self.local_repo_path, MANIFEST_FILE_NAME)
+        with open(manifest_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        logger.info(f"Rendered {len(self.manifest)} import blocks, manifest written to {manifest_path}")
+
+    def tag_imported_resources(self):
+        """
+        Tag the resources planned in this run with TF_IMPORTED so the next discovery skips them.
+        Only resources whose addresses all planned in the final plan are tagged, ARNs that couldn't be tagged are written to tag-failures.json.
+        """
+        arns = []
+        for arn, addresses in self.imported_arns:
+            if all(self.plan_summary.get(address, {}).get("status") in ("pass", "drift") for address in addresses):
+                arns.append(arn)
+            else:
+                logger.warning(f"Not tagging {arn}, its import didn't plan cleanly, see {PLAN_SUMMARY_FILE_NAME}")
+        if not arns:
+            return
+        client = Utilities.create_client(region=self.region, resource="resourcegroupstaggingapi", profile=self.aws_profile)
+        failures = tag_resources(client, arns, {"TF_IMPORTED": SkipTag.TF_IMPORTED.value})
+        if not failures:
+            return
+        failures_path = os.path.join(self.local_repo_path, TAG_FAILURES_FILE_NAME)
+        with open(failures_path, "w") as f:
+            json.dump(failures, f, indent=2)
+        logger.error(f"Couldn't tag {len(failures)} resources, see {failures_path}")
+
+    def plan_targets(self, addresses):
+        """
+        terraform plan -json limited to the given addresses, returns their pass, drift or error summary.
+        """
+        # Parallel plans would wait for each other on the state lock, planning doesn't write the state
+        lock = ["-lock=false"] if self.plan_workers > 1 else []
+        stdout, stderr, returncode = self.terraform("plan", "-json", *lock, *(f"-target={address}" for address in addresses), log_output=False)
+        summary = summarize_plan(stdout, addresses)
+        if returncode != 0 and not any(result["status"] == "error" for result in summary.values()):
+            summary = {address: {"status": "error", "action": None, "error": stderr.strip()} for address in addresses}
+        return summary
+
+    def verify_imports(self):
+        """
+        Final plan over the addresses imported in this run only, sharded over plan_workers parallel plans.
+        Resources already in the state aren't refreshed. The per resource summary is written to plan-summary.json.
+        """
+        addresses = list(dict.fromkeys(self.imported_addresses))
+        if not addresses:
+            logger.info("No resources imported in this run, skipping the final plan")
+            return
+        workers = max(1, min(self.plan_workers, len(addresses)))
+        shards = [addresses[index::workers] for index in range(workers)]
+        summary = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for shard_summary in executor.map(self.plan_targets, shards):
+                summary.update(shard_summary)
+
+        self.plan_summary = summary
+        summary_path = os.path.join(self.local_repo_path, PLAN_SUMMARY_FILE_NAME)
+        with open(summary_path, "w") as f:
+            json.dump({address: summary[address] for address in addresses}, f, indent=2)
+        counts = {status: sum(result["status"] == status for result in summary.values()) for status in ("pass", "drift", "error")}
+        for address in addresses:
+            result = summary[address]
+            if result["status"] == "drift":
+                logger.warning(f"{address} drifts from the generated config, planned action: {result['action']}")
+            elif result["status"] == "error":
+                logger.error(f"{address} failed to plan: {result['error']}")
+        logger.info(f"Final plan of {len(addresses)} imported resources: {counts['pass']} pass, {counts['drift']} drift, {counts['error']} error, summary written to {summary_path}")
+
+    def link_generated_config(self):
+        """
+        Rewrite hard coded IDs of imported resources in the generated config of this run into references.
+        """
+        if not self.generated_files:
+            return
+        index = build_reference_index(self.import_index.by_id)
+        changed = link_references(self.local_repo_path, self.generated_files, index)
+        self.fingerprints.rehash(changed)
+
+    def finalize(self):
+        """
+        Terraform fmt and a final plan of the imported resources, or only the manifest in render only mode.
+        """
+        if self.render_only:
+            self.write_manifest()
+            self.profiler.save()
+            return
+        self.plan_pending()
+        if self.quarantined:
+            logger.warning(f"{len(self.quarantined)} import files quarantined under {self.local_repo_path}/{QUARANTINE_DIR_NAME}: {self.quarantined}")
+        if self.sharded_output is not None:
+            self.sharded_output.flush()
+            self.generated_files.extend(self.sharded_output.generated_files())
+        self.restore_import_files()
+        if self.link_references:
+            with self.profiler.phase("cleanup"):
+                self.link_generated_config()
+        with self.profiler.phase("fmt"):
+            self.format_files()
+        self.fingerprints.save()
+        if self.sharded_output is not None:
+            self.sharded_output.write_manifest({entry["address"]: entry for entry in self.manifest})
+        with self.profiler.phase("plan"):
+            self.verify_imports()
+        if self.tag_imported:
+            self.tag_imported_resources()
+        self.profiler.save()
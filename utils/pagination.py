@@ -0,0 +1,48 @@
+import queue
+import threading
+
+# Pages fetched ahead of the consumer, bounds the memory held by a fast producer
+PREFETCH_PAGES = 2
+
+_DONE = object()
+
+
+def paginate_items(client, operation_name, result_key, prefetch_pages=PREFETCH_PAGES, **params):
+    """
+    Yield the items under result_key of every page of a paginated boto3 operation.
+    The next pages are fetched on a background thread while the caller processes the current one.
+    An error raised by the API is raised in the caller when it reaches that page.
+    """
+    pages = queue.Queue(maxsize=prefetch_pages)
+    stop = threading.Event()
+
+    def put(item):
+        # Give up when the consumer stopped iterating, instead of blocking on a full queue forever
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch():
+        try:
+            for page in client.get_paginator(operation_name).paginate(**params):
+                if not put(page):
+                    return
+            put(_DONE)
+        except Exception as e:
+            put(e)
+
+    threading.Thread(target=fetch, daemon=True).start()
+    try:
+        while True:
+            page = pages.get()
+            if page is _DONE:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield from page.get(result_key, [])
+    finally:
+        stop.set()
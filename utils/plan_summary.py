@@ -0,0 +1,39 @@
+import json
+
+# Planned actions that leave an imported resource as it is in AWS
+PASSING_ACTIONS = {"noop", "import", "move"}
+
+
+def summarize_plan(json_output, addresses):
+    """
+    Per address pass, drift or error summary from the machine readable output of terraform plan -json.
+    Addresses without a planned change pass. An error diagnostic without an address fails every address of the plan.
+    """
+    summary = {address: {"status": "pass", "action": "noop"} for address in addresses}
+    plan_errors = []
+    for line in json_output.splitlines():
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+
+        if message.get("type") == "planned_change":
+            change = message["change"]
+            address = change["resource"]["addr"]
+            if address in summary and summary[address]["status"] != "error":
+                status = "pass" if change["action"] in PASSING_ACTIONS else "drift"
+                summary[address] = {"status": status, "action": change["action"]}
+        elif message.get("type") == "diagnostic" and message["diagnostic"].get("severity") == "error":
+            diagnostic = message["diagnostic"]
+            address = diagnostic.get("address")
+            error = {"status": "error", "action": None, "error": diagnostic.get("summary", "")}
+            if address in summary:
+                summary[address] = error
+            elif address is None:
+                plan_errors.append(error)
+
+    for error in plan_errors:
+        for address, result in summary.items():
+            if result["status"] != "error":
+                summary[address] = error
+    return summary
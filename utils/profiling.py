@@ -0,0 +1,94 @@
+import cProfile
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from loguru import logger
+
+TOP_ALLOCATIONS = 25
+
+
+class RunProfiler:
+    """
+    Per phase CPU (cProfile) and memory (tracemalloc) capture of an import run.
+    A phase entered several times, like render or plan once per resource, adds up into one profile.
+    A phase entered while another one is active is counted in the outer phase.
+    cProfile only sees the thread running the phase, time spent in discovery worker threads shows up as waiting.
+    """
+
+    def __init__(self, modes=(), output_dir=None):
+        self.modes = set(modes)
+        self.output_dir = output_dir
+        self.active = None
+        self.wall_time = {}
+        self.cpu_profiles = {}
+        self.allocations = {}
+        self.peak_memory = {}
+
+    @property
+    def enabled(self):
+        return bool(self.modes)
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled or self.active is not None:
+            yield
+            return
+
+        self.active = name
+        if "memory" in self.modes:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+        if "cpu" in self.modes:
+            if name not in self.cpu_profiles:
+                self.cpu_profiles[name] = cProfile.Profile()
+            cpu_profile = self.cpu_profiles[name]
+            cpu_profile.enable()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.wall_time[name] = self.wall_time.get(name, 0.0) + time.monotonic() - start
+            if "cpu" in self.modes:
+                cpu_profile.disable()
+            if "memory" in self.modes:
+                self.peak_memory[name] = max(self.peak_memory.get(name, 0), tracemalloc.get_traced_memory()[1])
+                self.add_allocations(name, before, tracemalloc.take_snapshot())
+            self.active = None
+
+    def add_allocations(self, name, before, after):
+        """
+        Add the allocations made between two snapshots to the totals of a phase, by source line.
+        """
+        ignore = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+        allocations = self.allocations.setdefault(name, {})
+        for stat in after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno"):
+            if stat.size_diff == 0 and stat.count_diff == 0:
+                continue
+            size, count = allocations.get(stat.traceback, (0, 0))
+            allocations[stat.traceback] = (size + stat.size_diff, count + stat.count_diff)
+
+    def save(self):
+        """
+        Write <phase>.prof files and <phase>.allocations.txt reports into the output directory.
+        """
+        if not self.enabled:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        for name, cpu_profile in self.cpu_profiles.items():
+            cpu_profile.dump_stats(os.path.join(self.output_dir, f"{name}.prof"))
+
+        for name, allocations in self.allocations.items():
+            top = sorted(allocations.items(), key=lambda item: item[1][0], reverse=True)[:TOP_ALLOCATIONS]
+            with open(os.path.join(self.output_dir, f"{name}.allocations.txt"), "w") as f:
+                f.write(f"Phase {name}, peak traced memory {self.peak_memory[name] / 2**20:.1f} MiB\n")
+                f.write(f"Top {len(top)} allocations retained by source line\n\n")
+                for traceback, (size, count) in top:
+                    frame = traceback[0]
+                    f.write(f"{frame.filename}:{frame.lineno}: size={size / 1024:.1f} KiB, count={count}\n")
+
+        for name, elapsed in self.wall_time.items():
+            logger.info(f"Phase {name}: {elapsed:.2f}s wall time")
+        logger.info(f"Profiles written to {self.output_dir}")
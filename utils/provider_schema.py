@@ -0,0 +1,100 @@
+import json
+import os
+import re
+from loguru import logger
+
+# Attribute indexes per AWS provider version, built from `terraform providers schema -json` once per version
+PROVIDER_SCHEMA_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "tf-import", "provider-schemas")
+LOCK_FILE_NAME = ".terraform.lock.hcl"
+AWS_PROVIDER_VERSION_PATTERN = re.compile(r'provider\s+"[^"]*/hashicorp/aws"\s*\{\s*version\s*=\s*"([^"]+)"')
+
+_schemas = {}
+
+
+def attribute_kind(attribute):
+    if attribute.get("required"):
+        return "required"
+    if attribute.get("optional"):
+        return "optional_computed" if attribute.get("computed") else "optional"
+    return "computed"
+
+
+def index_block(block):
+    """
+    Attribute kinds (required, optional, optional_computed or computed) of a schema block and its nested blocks.
+    """
+    return {
+        "attributes": {name: attribute_kind(attribute) for name, attribute in block.get("attributes", {}).items()},
+        "blocks": {name: index_block(block_type["block"]) for name, block_type in block.get("block_types", {}).items()},
+    }
+
+
+def build_schema_index(schema_json):
+    """
+    Per resource type attribute index of the AWS provider from `terraform providers schema -json` output.
+    """
+    if not schema_json.strip():
+        return {}
+    for source, provider_schema in json.loads(schema_json)["provider_schemas"].items():
+        if source.endswith("/hashicorp/aws"):
+            return {resource_type: index_block(schema["block"]) for resource_type, schema in provider_schema.get("resource_schemas", {}).items()}
+    return {}
+
+
+def provider_version(local_repo_path):
+    lock_file_path = os.path.join(local_repo_path, LOCK_FILE_NAME)
+    if not os.path.exists(lock_file_path):
+        return None
+    with open(lock_file_path) as f:
+        match = AWS_PROVIDER_VERSION_PATTERN.search(f.read())
+    return match.group(1) if match else None
+
+
+class ProviderSchema:
+    """
+    Optional and computed attributes of every AWS resource type, for the provider version installed in the workspace.
+    path is the cached index file, None when the provider version is unknown and the index wasn't cached.
+    """
+
+    def __init__(self, resource_types, path=None):
+        self.resource_types = resource_types
+        self.path = path
+
+    def get(self, resource_type):
+        return self.resource_types.get(resource_type)
+
+
+def load_provider_schema(local_repo_path, terraform):
+    """
+    Load the AWS provider schema index of an initialized workspace, from the disk cache or by running terraform.
+    Returns None when terraform can't read the schema, cleanup then falls back to the pattern rules.
+    """
+    version = provider_version(local_repo_path)
+    if version in _schemas:
+        return _schemas[version]
+
+    cache_path = os.path.join(PROVIDER_SCHEMA_CACHE_DIR, f"aws-{version}.json") if version else None
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            _schemas[version] = ProviderSchema(json.load(f), cache_path)
+        return _schemas[version]
+
+    stdout, stderr, returncode = terraform("providers", "schema", "-json", log_output=False)
+    if returncode != 0:
+        logger.warning(f"Couldn't read the provider schema, generated config is cleaned up by pattern rules: {stderr}")
+        return None
+    resource_types = build_schema_index(stdout)
+    if not resource_types:
+        logger.warning("No AWS provider in the provider schema, generated config is cleaned up by pattern rules")
+        return None
+    if cache_path is None:
+        logger.warning(f"No AWS provider version in {LOCK_FILE_NAME}, the provider schema index isn't cached")
+        return ProviderSchema(resource_types)
+
+    os.makedirs(PROVIDER_SCHEMA_CACHE_DIR, exist_ok=True)
+    with open(f"{cache_path}.tmp", "w") as f:
+        json.dump(resource_types, f)
+    os.replace(f"{cache_path}.tmp", cache_path)
+    logger.info(f"Cached the schema index of {len(resource_types)} AWS resource types to {cache_path}")
+    _schemas[version] = ProviderSchema(resource_types, cache_path)
+    return _schemas[version]
@@ -0,0 +1,124 @@
+from dataclasses import dataclass, field
+from enum import IntFlag
+
+# Discovered inventory records. Slotted dataclasses hold no per record __dict__, which keeps large scans small in memory.
+
+
+@dataclass(slots=True)
+class Volume:
+    volume_id: str
+    volume_type: str
+    device: str
+    attachment_type: str = "data"
+
+
+@dataclass(slots=True)
+class Instance:
+    instance_id: str
+    private_ip: str
+    vpc_id: str
+    instance_name: str
+    volumes: list = field(default_factory=list)
+    arn: str = ""
+
+
+@dataclass(slots=True)
+class RDSClusterMember:
+    instance_identifier: str
+    db_parameter_group: list
+    option_groups: list
+
+
+@dataclass(slots=True)
+class RDSCluster:
+    identifier: str
+    kms_key_id: str
+    is_aurora: str
+    cluster_parameter: str
+    security_groups: list
+    cluster_instances: list
+    arn: str = ""
+
+
+@dataclass(slots=True)
+class RDSInstance:
+    identifier: str
+    kms_key_id: str
+    is_aurora: str
+    db_parameter_groups: list
+    security_groups: list
+    option_groups: list
+    arn: str = ""
+
+
+@dataclass(slots=True)
+class NodeGroup:
+    name: str
+    launch_template: str
+    asg_names: list
+
+
+@dataclass(slots=True)
+class ExternalASG:
+    asg_name: str
+    launch_template: str
+
+
+@dataclass(slots=True)
+class EKSCluster:
+    cluster_name: str
+    eks_add_ons: list
+    node_groups: list
+    vpc_id: str
+    security_groups: list
+    iam_role: str
+    manage_external_asgs: list
+    arn: str = ""
+
+
+@dataclass(slots=True)
+class LBListener:
+    listener_arn: str
+    listener_port: int
+    target_groups: list
+
+
+@dataclass(slots=True)
+class LoadBalancer:
+    lb_arn: str
+    lb_name: str
+    lb_type: str
+    lb_listeners: list
+    security_groups: list
+    s3_bucket: str
+
+
+class BucketFeature(IntFlag):
+    """
+    S3 Bucket sub resources to import. Template flags are named bucket_<feature name in lower case>.
+    """
+
+    POLICY = 1
+    ACL = 2
+    VERSIONING = 4
+    LIFECYCLE_RULE = 8
+    INTELLIGENT_TIERING = 16
+    CORS_CONFIG = 32
+    REPLICATION_CONFIG = 64
+    SERVER_SIDE_ENCRYPTION = 128
+
+
+@dataclass(slots=True)
+class S3Bucket:
+    bucket_name: str
+    features: int = 0
+
+    def template_flags(self):
+        return {f"bucket_{feature.name.lower()}": bool(self.features & feature) for feature in BucketFeature}
+
+
+@dataclass(slots=True)
+class EMRCluster:
+    cluster_name: str
+    cluster_id: str
+    arn: str = ""
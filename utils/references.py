@@ -0,0 +1,147 @@
+import os
+import re
+from loguru import logger
+
+GENERATED_RESOURCE_PATTERN = re.compile(r'^resource\s+"(\w+)"\s+"([^"]+)"\s*\{', re.MULTILINE)
+
+# A plain double quoted string literal, no escapes and no interpolation
+LITERAL_PATTERN = re.compile(r'"([^"\\\n$]*)"')
+
+# Tag values are free text, a tag value equal to an ID is no reference and could create a dependency cycle
+TAGS_PATTERN = re.compile(r"^[ \t]*tags(?:_all)?\s*=\s*\{", re.MULTILINE)
+
+# Name of the attribute assigned on a line, list elements on the lines below belong to it
+ATTRIBUTE_PATTERN = re.compile(r"[ \t]*(\w+)\s*=")
+
+# Attributes holding IDs, ARNs or names of other resources. Literals of any other attribute are left alone
+REFERENCE_ATTRIBUTE_PATTERN = re.compile(r"\w+_ids?|\w+_arns?|bucket|cluster_name|\w+_group_name")
+
+# Reference bearing attributes per resource type that the pattern doesn't cover, e.g. the launch template block id
+TYPE_REFERENCE_ATTRIBUTES = {
+    "aws_autoscaling_group": {"id"},
+    "aws_eks_node_group": {"id"},
+    "aws_rds_cluster_instance": {"cluster_identifier"},
+    "aws_db_instance": {"replicate_source_db"},
+}
+
+# Attribute holding the import ID when it isn't id (or arn for ARN import IDs)
+REFERENCE_ATTRIBUTES = {
+    "aws_db_instance": "identifier",
+}
+
+
+def resource_blocks(content):
+    """
+    Split generated config into (address, start, body start, end) resource blocks.
+    Comment lines right above a resource block belong to it, the body starts after the opening brace.
+    """
+    starts = []
+    for match in GENERATED_RESOURCE_PATTERN.finditer(content):
+        start = match.start()
+        while start > 0:
+            previous_line = content.rfind("\n", 0, start - 1) + 1
+            if not content.startswith("#", previous_line):
+                break
+            start = previous_line
+        starts.append((start, match.end(), f"{match.group(1)}.{match.group(2)}"))
+    return [(address, start, body_start, starts[index + 1][0] if index + 1 < len(starts) else len(content)) for index, (start, body_start, address) in enumerate(starts)]
+
+
+def tag_spans(body):
+    """
+    (start, end) spans of the tags and tags_all maps in a resource block body.
+    """
+    spans = []
+    for match in TAGS_PATTERN.finditer(body):
+        depth = 1
+        end = match.end()
+        while depth and end < len(body):
+            depth += {"{": 1, "}": -1}.get(body[end], 0)
+            end += 1
+        spans.append((match.start(), end))
+    return spans
+
+
+def build_reference_index(import_ids):
+    """
+    Map of import ID to (address, reference expression) from a {(terraform type, import ID): address} index.
+    An ID imported by several resources, like a bucket name for aws_s3_bucket and aws_s3_bucket_policy, refers to the one
+    whose type prefixes all the others. IDs without such a parent are ambiguous and left alone.
+    """
+    candidates = {}
+    for (resource_type, import_id), address in import_ids.items():
+        candidates.setdefault(import_id, []).append((resource_type, address))
+
+    index = {}
+    for import_id, resources in candidates.items():
+        resource_type, address = min(resources, key=lambda resource: len(resource[0]))
+        if not all(other_type.startswith(resource_type) for other_type, _ in resources):
+            continue
+        attribute = "arn" if import_id.startswith("arn:") else REFERENCE_ATTRIBUTES.get(resource_type, "id")
+        index[import_id] = (address, f"{address}.{attribute}")
+    return index
+
+
+def attribute_name(content, position):
+    """
+    Name of the attribute the literal at position is assigned to, None if no line up to it assigns one.
+    """
+    line_end = position
+    while line_end > 0:
+        line_start = content.rfind("\n", 0, line_end - 1) + 1
+        match = ATTRIBUTE_PATTERN.match(content, line_start, line_end)
+        if match:
+            return match.group(1)
+        line_end = line_start
+    return None
+
+
+def is_reference_attribute(resource_type, attribute):
+    return attribute is not None and (REFERENCE_ATTRIBUTE_PATTERN.fullmatch(attribute) is not None or attribute in TYPE_REFERENCE_ATTRIBUTES.get(resource_type, ()))
+
+
+def link_references(local_repo_path, generated_files, index):
+    """
+    Rewrite string literals of reference bearing attributes matching an imported resource ID into references to that
+    resource, one pass per file. A resource never refers to itself. Returns the generated files that changed.
+    """
+    changed = []
+    references = 0
+    for generated_file in generated_files:
+        path = os.path.join(local_repo_path, generated_file)
+        with open(path) as f:
+            content = f.read()
+
+        linked = []
+        position = 0
+        for address, _, body_start, end in resource_blocks(content):
+            linked.append(content[position:body_start])
+
+            def rewrite(match):
+                nonlocal references
+                target = index.get(match.group(1))
+                if target is None or target[0] == address:
+                    return match.group(0)
+                if not is_reference_attribute(address.split(".")[0], attribute_name(match.string, match.start())):
+                    return match.group(0)
+                references += 1
+                return target[1]
+
+            body = content[body_start:end]
+            body_position = 0
+            for span_start, span_end in tag_spans(body):
+                linked.append(LITERAL_PATTERN.sub(rewrite, body[body_position:span_start]))
+                linked.append(body[span_start:span_end])
+                body_position = span_end
+            linked.append(LITERAL_PATTERN.sub(rewrite, body[body_position:]))
+            position = end
+        linked.append(content[position:])
+
+        linked_content = "".join(linked)
+        if linked_content != content:
+            with open(path, "w") as f:
+                f.write(linked_content)
+            changed.append(generated_file)
+
+    logger.info(f"Linked {references} hard coded IDs to references in {len(changed)} generated files")
+    return changed
@@ -0,0 +1,25 @@
+import importlib
+
+# Resource name -> (module, Importer class). Modules are only imported when their resource is selected,
+# so argument parsing doesn't pay for boto3 and jinja2.
+IMPORTERS = {
+    "ec2": ("import_ec2", "EC2ImportSetUp"),
+    "rds": ("import_rds", "RDSImportSetUp"),
+    "eks": ("import_eks", "EKSImportSetUp"),
+    "alb": ("import_alb", "ALBImportSetUp"),
+    "s3": ("import_s3", "S3ImportSetUp"),
+    "emr": ("import_emr", "EMRImportSetUp"),
+}
+
+# Importer specific arguments on top of region, resource, local_repo_path, filters, profile, runner and resource_ids
+IMPORTER_ARGS = {
+    "ec2": ("hosted_zone_name",),
+}
+
+
+def get_importer(resource):
+    """
+    Import the module of a resource and return its Importer class.
+    """
+    module_name, class_name = IMPORTERS[resource]
+    return getattr(importlib.import_module(module_name), class_name)
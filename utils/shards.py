@@ -0,0 +1,115 @@
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from loguru import logger
+from utils.references import resource_blocks
+
+SHARD_MANIFEST_FILE_NAME = "shard-manifest.json"
+DEFAULT_SHARD_SIZE_KB = 512
+
+SHARD_FILE_PATTERN = re.compile(r"^(import|generated)-(\w+)-(\d+)\.tf(?:\.json)?(?:\.imported)?$")
+
+
+def atomic_write(path, content):
+    with open(f"{path}.tmp", "w") as f:
+        f.write(content)
+    os.replace(f"{path}.tmp", path)
+
+
+def line_range(content, start, end):
+    """
+    First and last line numbers of content[start:end], trailing blank lines aside.
+    """
+    return content.count("\n", 0, start) + 1, content.count("\n", 0, len(content[:end].rstrip())) + 1
+
+
+@dataclass(slots=True)
+class Shard:
+    file_name: str
+    parts: list = field(default_factory=list)
+    size: int = 0
+
+    @property
+    def content(self):
+        if self.file_name.endswith(".json"):
+            return json.dumps({"import": self.parts}, indent=2)
+        return "".join(self.parts)
+
+
+class ShardedOutput:
+    """
+    Import blocks and generated config of a run, grouped into files per kind and resource type of at most max_bytes,
+    e.g. import-aws_instance-000.tf and generated-aws_instance-000.tf. Shards are buffered in memory and written
+    atomically when full or on flush, numbering goes on from the shards earlier runs left in the workspace.
+    """
+
+    def __init__(self, local_repo_path, max_bytes):
+        self.local_repo_path = local_repo_path
+        self.max_bytes = max_bytes
+        self.open_shards = {}
+        self.files = []
+        self.next_index = {}
+        for file_name in os.listdir(local_repo_path):
+            match = SHARD_FILE_PATTERN.match(file_name)
+            if match:
+                key = (match.group(1), match.group(2))
+                self.next_index[key] = max(self.next_index.get(key, 0), int(match.group(3)) + 1)
+
+    def add(self, kind, resource_type, part, extension=".tf"):
+        """
+        Buffer a block in the open shard of its kind and resource type, a full shard is written first. Returns the shard file name.
+        part is text, or an import block dict for .tf.json shards.
+        """
+        key = (kind, resource_type)
+        size = len((part if isinstance(part, str) else json.dumps(part)).encode())
+        shard = self.open_shards.get(key)
+        if shard is not None and shard.parts and shard.size + size > self.max_bytes:
+            self.write(shard)
+            shard = None
+        if shard is None:
+            index = self.next_index.get(key, 0)
+            self.next_index[key] = index + 1
+            shard = self.open_shards[key] = Shard(f"{kind}-{resource_type}-{index:03d}{extension}")
+            self.files.append(shard.file_name)
+        shard.parts.append(part)
+        shard.size += size
+        return shard.file_name
+
+    def write(self, shard):
+        path = os.path.join(self.local_repo_path, shard.file_name)
+        if shard.file_name.startswith("import-"):
+            # Hidden from the plans of the rest of the run like the per resource import files, restored at the end
+            path = f"{path}.imported"
+        atomic_write(path, shard.content)
+
+    def flush(self):
+        for shard in self.open_shards.values():
+            self.write(shard)
+        self.open_shards = {}
+        logger.info(f"Wrote {len(self.files)} shard files to {self.local_repo_path}")
+
+    def generated_files(self):
+        return [file_name for file_name in self.files if file_name.startswith("generated-")]
+
+    def write_manifest(self, imports):
+        """
+        Map every resource in the generated shards of this run to its import ID, import file, shard file and line range.
+        imports holds the manifest entry of each imported address. Entries of earlier runs are kept.
+        """
+        entries = []
+        for file_name in self.generated_files():
+            with open(os.path.join(self.local_repo_path, file_name)) as f:
+                content = f.read()
+            for address, start, _, end in resource_blocks(content):
+                start_line, end_line = line_range(content, start, end)
+                entry = imports.get(address, {})
+                entries.append({"address": address, "id": entry.get("id", ""), "import_file": entry.get("file", ""), "file": file_name, "start_line": start_line, "end_line": end_line})
+
+        manifest_path = os.path.join(self.local_repo_path, SHARD_MANIFEST_FILE_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                addresses = {entry["address"] for entry in entries}
+                entries = [entry for entry in json.load(f) if entry["address"] not in addresses] + entries
+        atomic_write(manifest_path, json.dumps(entries, indent=2))
+        logger.info(f"Shard manifest of {len(entries)} resources written to {manifest_path}")
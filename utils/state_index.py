@@ -0,0 +1,67 @@
+import json
+import os
+from loguru import logger
+
+STATE_FILE_NAME = "terraform.tfstate"
+
+# Attributes holding the value resources are imported by, depending on the resource type
+IMPORT_ID_ATTRIBUTES = ("id", "arn", "name", "identifier", "cluster_identifier", "bucket")
+
+
+class StateIndex:
+    """
+    In memory index of the resources terraform already manages in the workspace, keyed by (terraform type, import ID).
+    Built once per run from `terraform show -json`, or from the local state file when no terraform command may run.
+    """
+
+    def __init__(self):
+        self.by_id = {}
+        self.addresses = set()
+
+    def add(self, address, resource_type, attributes):
+        self.addresses.add(address)
+        for attribute in IMPORT_ID_ATTRIBUTES:
+            value = attributes.get(attribute)
+            if isinstance(value, str) and value:
+                self.by_id.setdefault((resource_type, value), address)
+
+    def lookup(self, address, import_id):
+        """
+        Address managing this resource, None if there is none.
+        """
+        return self.by_id.get((address.split(".")[0], import_id))
+
+    def load_show_json(self, show_output):
+        """
+        Index the managed resources of `terraform show -json` output, child modules included.
+        """
+        values = json.loads(show_output or "{}").get("values") or {}
+        modules = [values.get("root_module") or {}]
+        while modules:
+            module = modules.pop()
+            for resource in module.get("resources", []):
+                if resource.get("mode") == "managed":
+                    self.add(resource["address"], resource["type"], resource.get("values") or {})
+            modules.extend(module.get("child_modules", []))
+        logger.info(f"Indexed {len(self.addresses)} resources managed in the terraform state")
+
+    def load_state_file(self, local_repo_path):
+        """
+        Index the managed resources of a local terraform.tfstate file, if there is one.
+        """
+        path = os.path.join(local_repo_path, STATE_FILE_NAME)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            state = json.load(f)
+        for resource in state.get("resources", []):
+            if resource.get("mode") != "managed":
+                continue
+            address = f"{resource['type']}.{resource['name']}"
+            if "module" in resource:
+                address = f"{resource['module']}.{address}"
+            for instance in resource.get("instances", []):
+                index_key = instance.get("index_key")
+                instance_address = address if index_key is None else f"{address}[{json.dumps(index_key)}]"
+                self.add(instance_address, resource["type"], instance.get("attributes") or {})
+        logger.info(f"Indexed {len(self.addresses)} resources managed in {path}")
@@ -0,0 +1,40 @@
+import time
+from botocore.exceptions import ClientError
+from loguru import logger
+
+# resourcegroupstaggingapi tag_resources accepts at most 20 ARNs per call
+TAG_BATCH_SIZE = 20
+TAG_MAX_ATTEMPTS = 5
+TAG_RETRY_BASE_SECONDS = 1
+
+RETRYABLE_ERROR_CODES = {"InternalServiceException", "ThrottlingException", "Throttling", "TooManyRequestsException"}
+
+
+def tag_resources(client, arns, tags):
+    """
+    Tag resources in batches of TAG_BATCH_SIZE ARNs through the Resource Groups Tagging API.
+    ARNs failing with a throttling or internal error are retried with exponential backoff.
+    Returns the ARNs that couldn't be tagged, mapped to the error.
+    """
+    failures = {}
+    for start in range(0, len(arns), TAG_BATCH_SIZE):
+        batch = arns[start : start + TAG_BATCH_SIZE]
+        for attempt in range(TAG_MAX_ATTEMPTS):
+            try:
+                failed = client.tag_resources(ResourceARNList=batch, Tags=tags)["FailedResourcesMap"]
+            except ClientError as e:
+                failed = {arn: {"ErrorCode": e.response["Error"]["Code"], "ErrorMessage": str(e)} for arn in batch}
+
+            batch = [arn for arn, error in failed.items() if error.get("ErrorCode") in RETRYABLE_ERROR_CODES]
+            for arn, error in failed.items():
+                if arn not in batch:
+                    failures[arn] = error.get("ErrorMessage") or error.get("ErrorCode")
+            if not batch:
+                break
+            if attempt + 1 < TAG_MAX_ATTEMPTS:
+                time.sleep(TAG_RETRY_BASE_SECONDS * 2**attempt)
+        else:
+            failures.update({arn: f"{failed[arn].get('ErrorCode')} after {TAG_MAX_ATTEMPTS} attempts" for arn in batch})
+
+    logger.info(f"Tagged {len(arns) - len(failures)} of {len(arns)} resources with {tags}")
+    return failures
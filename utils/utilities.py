@@ -7,7 +7,14 @@ import sys
 from jinja2 import Environment, FileSystemLoader
 import os
 from enum import Enum
+import threading
 from botocore.exceptions import NoCredentialsError, ProfileNotFound
+from utils import cassette
+
+# Boto3 clients and compiled templates are kept for the life of the process, so a long running daemon pays for them once
+_client_cache = {}
+_client_cache_lock = threading.Lock()
+_template_env = None
 
 
 class SkipTag(Enum):
@@ -51,8 +58,26 @@ class Utilities:
 
     @staticmethod
     def create_client(region, resource, env_file_path=".env", profile=None):
+        """
+        Create a boto3 client, cached per region, resource and profile.
+        """
+        key = (region, resource, env_file_path, profile)
+        with _client_cache_lock:
+            if key not in _client_cache:
+                _client_cache[key] = Utilities.new_client(region=region, resource=resource, env_file_path=env_file_path, profile=profile)
+            return _client_cache[key]
+
+    @staticmethod
+    def new_client(region, resource, env_file_path=".env", profile=None):
         load_dotenv(dotenv_path=env_file_path)
 
+        active_cassette = cassette.active()
+        if active_cassette is not None and active_cassette.mode == "replay":
+            # Replayed calls never reach AWS, no credentials needed
+            client = boto3.client(resource, aws_access_key_id="replay", aws_secret_access_key="replay", region_name=region)
+            active_cassette.attach(client)
+            return client
+
         try:
             if profile:
                 session = boto3.Session(profile_name=profile, region_name=region)
@@ -68,6 +93,8 @@ class Utilities:
                 # Create client with access key, secret key, and optional region
                 client = boto3.client(resource, aws_access_key_id=access_key, aws_secret_access_key=secret_key, region_name=region)
 
+            if active_cassette is not None:
+                active_cassette.attach(client)
             return client
 
         except ProfileNotFound:
@@ -75,17 +102,28 @@ class Utilities:
         except NoCredentialsError:
             raise NoCredentialsError("AWS credentials not found. Please provide them via environment variables or a profile.")
 
-    def run_terraform_cmd(cmd, profile):
+    @staticmethod
+    def get_template_env():
+        """
+        Jinja Environment for the templates directory. Compiled templates are cached by the Environment.
+        """
+        global _template_env
+        if _template_env is None:
+            _template_env = Environment(loader=FileSystemLoader("templates"))
+        return _template_env
+
+    def run_terraform_cmd(cmd, profile, log_output=True):
         print(cmd)
         try:
             env = os.environ.copy()
             env["AWS_PROFILE"] = profile
             completed_process = subprocess.run(cmd, text=True, capture_output=True, env=env)
             if completed_process.returncode == 0:
-                logger.info(completed_process.stdout)
+                if log_output:
+                    logger.info(completed_process.stdout)
             else:
                 logger.info(completed_process.stderr)
-            return completed_process.stdout, completed_process.stderr
+            return completed_process.stdout, completed_process.stderr, completed_process.returncode
         except subprocess.CalledProcessError as e:
             logger.error(f"Error during terraform {cmd}: {e}")
             sys.exit(1)
@@ -98,8 +136,7 @@ class Utilities:
             logger.info(f"File {output_file_path} already exists.")
             return
         logger.info(f"Creating providers.tf file inside {local_repo_path}")
-        tmpl = Environment(loader=FileSystemLoader("templates"))
-        template = tmpl.get_template("providers.tf.j2")
+        template = Utilities.get_template_env().get_template("providers.tf.j2")
         context = {"cloud_provider_region": region}
 
         rendered_template = template.render(context)